@@ -1,15 +1,20 @@
-import jwt
-import time
 import enum
+import config
 import uuid
+import random
+import asyncio
 import base64
 import aiohttp
 import logging
 # from bot import db
 from api import errors
 from database import Database
-from api.key import KeyManager
-from typing import Optional, Dict, Any, Union
+from api.key import KeyManager, KeyPool
+from api.token import TokenCache
+from api.cache import ResponseCache
+from api.session import SessionPool
+from api.ratelimit import RateLimiter
+from typing import Optional, Dict, Any, Union, AsyncIterator, List
 
 
 class DeviceType(enum.Enum):
@@ -17,6 +22,11 @@ class DeviceType(enum.Enum):
     MAC_OS = "MAC_OS"
 
 
+# device attributes the bot reads from the udids collection: udid and model are shown,
+# status and addedDate drive the checker, deviceClass filters imports
+DEVICE_FIELDS = ["udid", "deviceClass", "status", "model", "addedDate"]
+
+
 async def fetch_error_message(response: aiohttp.ClientResponse) -> str:
     try:
         error_response = await response.json(content_type=None)
@@ -29,9 +39,37 @@ async def fetch_error_message(response: aiohttp.ClientResponse) -> str:
             return "Failed to retrieve error message"
 
 
+async def gather_bounded(*aws, limit: int, return_exceptions: bool = False) -> list:
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws), return_exceptions=return_exceptions)
+
+
 class AioHttpClient:
-    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
-        self.session = session or aiohttp.ClientSession()
+    rate_limiter = RateLimiter()
+
+    max_retries: int = 4
+    backoff_base: float = 1.0
+    backoff_max: float = 30.0
+    # POSTs are not retried on 5xx, apple may have created the resource anyway
+    idempotent_methods = {"GET", "PUT", "PATCH", "DELETE"}
+
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None, rate_limit_key: Optional[str] = None, interactive: bool = True):
+        # requests go through the process-wide pool unless a session is given
+        self.session = session or SessionPool.get()
+        self.rate_limit_key = rate_limit_key
+        # background requests leave the rate limiter's reserve to interactive ones
+        self.interactive = interactive
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        # full jitter, so throttled callers don't retry in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
 
     async def request(
         self,
@@ -41,53 +79,90 @@ class AioHttpClient:
         params: Optional[Dict[str, Any]] = None,
         **kwargs,
     ) -> Union[Dict[str, Any], None]:
-        async with self.session.request(
-            method=method, url=url, headers=headers, params=params, **kwargs
-        ) as response:
-            if response.ok:
-                if method in ["PUT", "DELETE"]:
-                    return
-                return await response.json()
-            elif response.status == 400:
-                error_message = await fetch_error_message(response)
-                logging.exception(error_message)
-                raise errors.ErrorResponse(error_message)
-            elif response.status == 401:
-                error_message = await fetch_error_message(response)
-                logging.exception(error_message)
-                raise errors.Unauthorized(error_message)
-            elif response.status == 403:
-                error_message = await fetch_error_message(response)
-                logging.exception(error_message)
-                raise errors.Forbidden(error_message)
-            elif response.status == 409:
-                error_message = await fetch_error_message(response)
-                logging.exception(error_message)
-                raise errors.Conflict(error_message)
-            else:
-                raise Exception(
-                    f"[{response.status}] Failed to retrieve data. \nURL : {url}\nHeaders : {headers}\nParameters : {params}\nResponse Text : {await response.text()}"
-                )
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire(self.rate_limit_key, reserve=0 if self.interactive else None)
+
+            async with self.session.request(
+                method=method, url=url, headers=headers, params=params, **kwargs
+            ) as response:
+                self.rate_limiter.update(self.rate_limit_key, response.headers)
+
+                if response.ok:
+                    if method in ["PUT", "DELETE"]:
+                        return
+                    return await response.json()
+                elif response.status == 400:
+                    error_message = await fetch_error_message(response)
+                    logging.exception(error_message)
+                    raise errors.ErrorResponse(error_message)
+                elif response.status == 401:
+                    error_message = await fetch_error_message(response)
+                    logging.exception(error_message)
+                    raise errors.Unauthorized(error_message)
+                elif response.status == 403:
+                    error_message = await fetch_error_message(response)
+                    logging.exception(error_message)
+                    raise errors.Forbidden(error_message)
+                elif response.status == 409:
+                    error_message = await fetch_error_message(response)
+                    logging.exception(error_message)
+                    raise errors.Conflict(error_message)
+                elif response.status == 429:
+                    self.rate_limiter.exhaust(self.rate_limit_key)
+                    if attempt == self.max_retries:
+                        error_message = await fetch_error_message(response)
+                        logging.error(f"Rate limited after {attempt + 1} attempts: {error_message}")
+                        raise errors.RateLimited(error_message)
+                elif response.status >= 500 and method in self.idempotent_methods and attempt < self.max_retries:
+                    pass
+                else:
+                    raise Exception(
+                        f"[{response.status}] Failed to retrieve data. \nURL : {url}\nHeaders : {headers}\nParameters : {params}\nResponse Text : {await response.text()}"
+                    )
+
+                delay = self.backoff(attempt, response.headers.get("Retry-After"))
+                logging.warning(f"[{response.status}] {method} {url} failed, retrying in {delay:.1f} seconds")
+
+            await asyncio.sleep(delay)
 
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, *excinfo):
-        await self.session.close()
+        # the session is shared, so it is closed by SessionPool.close() on shutdown
+        pass
 
 
 class AppleDeveloperAccount:
-    API_ENDPOINT = "https://api.appstoreconnect.apple.com/v1"
+    API_ENDPOINT = config.ASC_API_ENDPOINT
 
     # you can pick which capabilities you want enabled by default:
     # https://developer.apple.com/documentation/appstoreconnectapi/capabilitytype
     CAPABILITIES = [
     ]
+    CAPABILITY_CONCURRENCY = 5
+    CERTIFICATE_CONCURRENCY = 5
+    PROVISION_CONCURRENCY = 10
 
-    def __init__(self, key_id: str, issuer_id: str, p8_file: str):
+    def __init__(self, key_id: str, issuer_id: str, p8_file: str, interactive: bool = True):
         self.key_id = key_id
         self.p8_file = p8_file
         self.issuer_id = issuer_id
+        # False for background jobs, see AioHttpClient
+        self.interactive = interactive
+
+    @classmethod
+    def from_account(cls, account_data: dict, interactive: bool = True) -> "AppleDeveloperAccount":
+        return cls(
+            key_id=account_data["key_id"],
+            issuer_id=account_data["issue_id"],
+            p8_file=base64.b64decode(account_data["p8_file"]),
+            interactive=interactive,
+        )
+
+    @property
+    def rate_limit_budget(self) -> Dict[str, int]:
+        return AioHttpClient.rate_limiter.budget(self.key_id)
 
     @property
     def headers(self) -> Dict[str, str]:
@@ -95,50 +170,89 @@ class AppleDeveloperAccount:
         return {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
 
     def generate_token(self) -> str:
-        private_key = self.p8_file
-        headers = {"alg": "ES256", "kid": self.key_id, "typ": "JWT"}
-        payload = {
-            "iss": self.issuer_id,
-            "iat": int(time.time()),
-            "exp": int(time.time()) + 20 * 60,  # Token expires after 20 minutes
-            "aud": "appstoreconnect-v1",
-            "jti": str(uuid.uuid4()),
-        }
-
-        token = jwt.encode(payload, private_key, algorithm="ES256", headers=headers)
-        return token
+        # signed tokens are shared by every instance using the same key
+        return TokenCache.get_token(key_id=self.key_id, issuer_id=self.issuer_id, p8_file=self.p8_file)
 
     async def get_certificates(self) -> Any:
         url = AppleDeveloperAccount.API_ENDPOINT + "/certificates"
-        headers = self.headers
 
-        async with AioHttpClient() as http_client:
-            data = await http_client.request("GET", url, headers=headers)
-            return data.get("data", [])
+        async def fetch():
+            async with AioHttpClient(rate_limit_key=self.key_id, interactive=self.interactive) as http_client:
+                data = await http_client.request("GET", url, headers=self.headers)
+                return data.get("data", [])
+
+        return await ResponseCache.fetch(self.key_id, "certificates", fetch)
 
     async def get_certificate_info(self, certificate_id: str) -> Any:
         url = AppleDeveloperAccount.API_ENDPOINT + f"/certificates/{certificate_id}"
-        headers = self.headers
 
-        async with AioHttpClient() as http_client:
-            return await http_client.request("GET", url, headers=headers)
+        async def fetch():
+            async with AioHttpClient(rate_limit_key=self.key_id, interactive=self.interactive) as http_client:
+                return await http_client.request("GET", url, headers=self.headers)
 
-    async def get_devices_info(self, platform: DeviceType) -> Any:
+        return await ResponseCache.fetch(self.key_id, "certificate", fetch, resource_id=certificate_id)
+
+    async def iter_devices(
+        self,
+        platform: Optional[DeviceType] = None,
+        fields: Optional[List[str]] = None,
+        status: Optional[List[str]] = None,
+        limit: int = 200,
+        ids: Optional[List[str]] = None,
+    ) -> AsyncIterator[dict]:
+        url = AppleDeveloperAccount.API_ENDPOINT + "/devices"
+        params = {"limit": limit}
+        if platform:
+            params["filter[platform]"] = platform.value
+        if fields:
+            params["fields[devices]"] = ",".join(fields)
+        if status:
+            params["filter[status]"] = ",".join(status)
+        if ids:
+            params["filter[id]"] = ",".join(ids)
+
+        async with AioHttpClient(rate_limit_key=self.key_id, interactive=self.interactive) as http_client:
+            while url:
+                data = await http_client.request("GET", url, headers=self.headers, params=params)
+                for device in data.get("data", []):
+                    yield device
+
+                # the next link already carries every query parameter
+                url = data.get("links", {}).get("next")
+                params = None
+
+    async def get_devices_info(
+        self,
+        platform: DeviceType,
+        fields: Optional[List[str]] = None,
+        status: Optional[List[str]] = None,
+    ) -> List[dict]:
+        return [device async for device in self.iter_devices(platform, fields=fields, status=status)]
+
+    async def count_devices(self, platform: DeviceType) -> int:
         url = AppleDeveloperAccount.API_ENDPOINT + "/devices"
         headers = self.headers
-        params = {"filter[platform]": platform.value, "limit": 200}
+        params = {"filter[platform]": platform.value, "fields[devices]": "status", "limit": 1}
 
-        async with AioHttpClient() as http_client:
+        async with AioHttpClient(rate_limit_key=self.key_id, interactive=self.interactive) as http_client:
             data = await http_client.request("GET", url, headers=headers, params=params)
-            return data.get("data", [])
 
-    async def get_account_info(self) -> Any:
+        total = data.get("meta", {}).get("paging", {}).get("total")
+        if total is None:
+            total = len([device async for device in self.iter_devices(platform, fields=["status"])])
+        return total
+
+    async def get_account_info(self, cached: bool = True) -> Any:
         url = AppleDeveloperAccount.API_ENDPOINT + "/users"
-        headers = self.headers
 
-        async with AioHttpClient() as http_client:
-            data = await http_client.request("GET", url, headers=headers)
-            return data.get("data", [])
+        async def fetch():
+            async with AioHttpClient(rate_limit_key=self.key_id, interactive=self.interactive) as http_client:
+                data = await http_client.request("GET", url, headers=self.headers)
+                return data.get("data", [])
+
+        if not cached:
+            return await fetch()
+        return await ResponseCache.fetch(self.key_id, "users", fetch)
 
 
     async def register_udid(self, udid: str, device_type: DeviceType):
@@ -154,7 +268,7 @@ class AppleDeveloperAccount:
                 }
             }
         }
-        async with AioHttpClient() as http_client:
+        async with AioHttpClient(rate_limit_key=self.key_id, interactive=self.interactive) as http_client:
             return await http_client.request("POST", url, headers=headers, json=payload)
 
 
@@ -162,35 +276,59 @@ class AppleDeveloperAccount:
         url = AppleDeveloperAccount.API_ENDPOINT + "/certificates"
         headers = self.headers
 
-        async with AioHttpClient() as http_client:
+        async with AioHttpClient(rate_limit_key=self.key_id, interactive=self.interactive) as http_client:
             data = await http_client.request("GET", url, headers=headers)
-            certificates = data.get("data", [])
-            for cert in certificates:
-                cert_id = cert["id"]
-                if cert["attributes"]["certificateType"] in ["IOS_DISTRIBUTION", "IOS_DEVELOPMENT"]:
-                    delete_url = f"{url}/{cert_id}"
-                    await http_client.request("DELETE", delete_url, headers=headers)
+            certificates = [
+                cert for cert in data.get("data", [])
+                if cert["attributes"]["certificateType"] in ["IOS_DISTRIBUTION", "IOS_DEVELOPMENT"]
+            ]
+            await gather_bounded(
+                *(http_client.request("DELETE", f"{url}/{cert['id']}", headers=headers) for cert in certificates),
+                limit=AppleDeveloperAccount.CERTIFICATE_CONCURRENCY,
+            )
+
+        await ResponseCache.invalidate(self.key_id, "certificates")
+        for cert in certificates:
+            await ResponseCache.invalidate(self.key_id, "certificate", cert["id"])
 
     # formerly create_adhoc_certificate
     async def create_p12_certificates(self, password: str) -> tuple[str, str, str, str]:
-        private_key, csr_key = KeyManager.generate_keys()
-        private_key_dev, csr_key_dev = KeyManager.generate_keys()
+        (private_key, csr_key), (private_key_dev, csr_key_dev) = await asyncio.gather(KeyPool.get(), KeyPool.get())
         url = AppleDeveloperAccount.API_ENDPOINT + "/certificates"
         headers = self.headers
-        data = {
-            "data": {
-                "type": "certificates",
-                "attributes": {
-                    "certificateType": "IOS_DISTRIBUTION",
-                    "csrContent": csr_key.decode("utf-8"),
-                },
+
+        def payload(certificate_type: str, csr: bytes) -> dict:
+            return {
+                "data": {
+                    "type": "certificates",
+                    "attributes": {
+                        "certificateType": certificate_type,
+                        "csrContent": csr.decode("utf-8"),
+                    },
+                }
             }
-        }
 
-        async with AioHttpClient() as http_client:
-            response = await http_client.request("POST", url=url, headers=headers, json=data)
-            data["data"]["attributes"] = {"certificateType": "IOS_DEVELOPMENT", "csrContent": csr_key_dev.decode("utf-8")}
-            response_dev = await http_client.request("POST", url=url, headers=self.headers, json=data)
+        async with AioHttpClient(rate_limit_key=self.key_id, interactive=self.interactive) as http_client:
+            responses = await gather_bounded(
+                http_client.request("POST", url=url, headers=headers, json=payload("IOS_DISTRIBUTION", csr_key)),
+                http_client.request("POST", url=url, headers=headers, json=payload("IOS_DEVELOPMENT", csr_key_dev)),
+                limit=AppleDeveloperAccount.CERTIFICATE_CONCURRENCY,
+                return_exceptions=True,
+            )
+            await ResponseCache.invalidate(self.key_id, "certificates")
+
+            failed = [response for response in responses if isinstance(response, BaseException)]
+            if failed:
+                # don't leave the other certificate behind, it counts against the account's limit
+                for response in responses:
+                    if isinstance(response, BaseException):
+                        continue
+                    try:
+                        await http_client.request("DELETE", f"{url}/{response['data']['id']}", headers=headers)
+                    except Exception:
+                        logging.exception(f"Error while deleting certificate {response['data']['id']}")
+                raise failed[0]
+            response, response_dev = responses
 
             certificate_id = response["data"]["id"]
             cert_content = response["data"]["attributes"]["certificateContent"]
@@ -201,10 +339,12 @@ class AppleDeveloperAccount:
             pem_file = KeyManager.convert_cert_to_pem(base64.b64decode(cert_content))
             pem_file_dev = KeyManager.convert_cert_to_pem(base64.b64decode(cert_content_dev))
 
-            return (
-                certificate_id, KeyManager.generate_p12(key_file=private_key, pem_file=pem_file, password=password),
-                certificate_id_dev, KeyManager.generate_p12(key_file=private_key_dev, pem_file=pem_file_dev, password=password)
+            # pkcs12 key derivation is slow enough to stall other updates
+            p12, p12_dev = await asyncio.gather(
+                asyncio.to_thread(KeyManager.generate_p12, key_file=private_key, pem_file=pem_file, password=password),
+                asyncio.to_thread(KeyManager.generate_p12, key_file=private_key_dev, pem_file=pem_file_dev, password=password),
             )
+            return certificate_id, p12, certificate_id_dev, p12_dev
 
     async def generate_certificate(self, password: str) -> tuple[str, str, str, str]:
         await self.revoke_existing_certificates()
@@ -225,7 +365,7 @@ class AppleDeveloperAccount:
             }
         }
 
-        async with AioHttpClient() as http_client:
+        async with AioHttpClient(rate_limit_key=self.key_id, interactive=self.interactive) as http_client:
             try:
                 response = await http_client.request("POST", url=url, headers=headers, json=new_app_payload)
             except errors.Conflict:  # shouldnt happen anymore, due to uuid used
@@ -245,7 +385,12 @@ class AppleDeveloperAccount:
 
             capability_url = AppleDeveloperAccount.API_ENDPOINT + "/bundleIdCapabilities"
             capabilities_status = {capabilty: False for capabilty in AppleDeveloperAccount.CAPABILITIES}
-            for no, capability in enumerate(AppleDeveloperAccount.CAPABILITIES, start=1):
+            total_capabilities = len(AppleDeveloperAccount.CAPABILITIES)
+            completed = 0
+            callback_lock = asyncio.Lock()
+
+            async def enable_capability(capability: str):
+                nonlocal completed
                 payload = {
                     "data": {
                         "type": "bundleIdCapabilities",
@@ -255,25 +400,44 @@ class AppleDeveloperAccount:
                         },
                     }
                 }
-                await http_client.request("POST", url=capability_url, headers=headers, json=payload)
-                capabilities_status[capability] = True
-
+                try:
+                    await http_client.request("POST", url=capability_url, headers=headers, json=payload)
+                    capabilities_status[capability] = True
+                except Exception:
+                    # a single failing capability shouldn't abort the import
+                    logging.exception(f"Failed to enable capability {capability} for app id {app_id}")
+
+                completed += 1
                 if callback and callable(callback):
-                    total_capabilities = len(AppleDeveloperAccount.CAPABILITIES)
-                    if (no % k == 0) or (no == total_capabilities):
-                        try:
-                            await callback(capabilities_status=capabilities_status)
-                        except Exception as e:
-                            logging.exception(f"Error executing callable: {e}")
+                    if (completed % k == 0) or (completed == total_capabilities):
+                        # keep progress edits ordered
+                        async with callback_lock:
+                            try:
+                                await callback(capabilities_status=capabilities_status)
+                            except Exception as e:
+                                logging.exception(f"Error executing callable: {e}")
+
+            await gather_bounded(
+                *(enable_capability(capability) for capability in AppleDeveloperAccount.CAPABILITIES),
+                limit=AppleDeveloperAccount.CAPABILITY_CONCURRENCY,
+            )
+
+            failed = [capability for capability, enabled in capabilities_status.items() if not enabled]
+            if failed:
+                logging.warning(f"Could not enable {len(failed)}/{total_capabilities} capabilities for app id {app_id}: {', '.join(failed)}")
 
             return app_id, iden
 
     async def create_provision(self, certificate_id: str, device_id: str, app_id: str, adhoc: bool = True) -> dict:
+        profile = await self.create_profile(certificate_id=certificate_id, device_id=device_id, app_id=app_id, adhoc=adhoc)
+        return profile['attributes']
+
+    async def create_profile(self, certificate_id: str, device_id: str, app_id: str, adhoc: bool = True) -> dict:
         profile_url = AppleDeveloperAccount.API_ENDPOINT + "/profiles"
         headers = self.headers
         profileType = "IOS_APP_ADHOC" if adhoc else "IOS_APP_DEVELOPMENT"
 
-        async with AioHttpClient() as http_client:
+        async with AioHttpClient(rate_limit_key=self.key_id, interactive=self.interactive) as http_client:
             attributes = {
                 "name": str(uuid.uuid4()).replace('-', '0')[:16],
                 "profileType": profileType
@@ -313,7 +477,68 @@ class AppleDeveloperAccount:
             }
 
             profile_data = await http_client.request("POST", url=profile_url, headers=headers, json=payload)
-            return profile_data['data']['attributes']
+            return profile_data['data']
+
+    async def delete_profile(self, profile_id: str):
+        url = AppleDeveloperAccount.API_ENDPOINT + f"/profiles/{profile_id}"
+        async with AioHttpClient(rate_limit_key=self.key_id, interactive=self.interactive) as http_client:
+            await http_client.request("DELETE", url, headers=self.headers)
+
+    async def create_provision_pair(self, certificate_id: str, certificate_id_dev: Optional[str], device_id: str, app_id: str) -> tuple[dict, dict]:
+        # the ad-hoc profile is required, the development one is best effort
+        # (download_certificate_handler already copes with it missing)
+        tasks = [self.create_profile(certificate_id=certificate_id, device_id=device_id, app_id=app_id)]
+        if certificate_id_dev:
+            tasks.append(self.create_profile(certificate_id=certificate_id_dev, device_id=device_id, app_id=app_id, adhoc=False))
+
+        profile, *rest = await asyncio.gather(*tasks, return_exceptions=True)
+        profile_dev = rest[0] if rest else None
+
+        if isinstance(profile, BaseException):
+            # without the ad-hoc profile the pair is thrown away, don't leave the development one behind
+            if profile_dev is not None and not isinstance(profile_dev, BaseException):
+                try:
+                    await self.delete_profile(profile_dev["id"])
+                except Exception:
+                    logging.exception(f"Error while deleting development profile {profile_dev['id']}")
+            raise profile
+        if isinstance(profile_dev, BaseException):
+            logging.error(f"Failed to create development provision for device {device_id}: {profile_dev}")
+            profile_dev = None
+        return profile["attributes"], profile_dev["attributes"] if profile_dev else {}
+
+    async def create_provision_pairs(
+        self,
+        certificate_id: str,
+        certificate_id_dev: Optional[str],
+        device_ids: List[str],
+        app_id: str,
+        callback: callable = None,
+        k: int = 10,
+    ) -> Dict[str, Union[tuple[dict, dict], Exception]]:
+        results = {}
+        completed = 0
+
+        async def create_pair(device_id: str):
+            nonlocal completed
+            try:
+                results[device_id] = await self.create_provision_pair(certificate_id, certificate_id_dev, device_id, app_id)
+            except Exception as e:
+                logging.exception(f"Failed to create provisions for device {device_id}")
+                results[device_id] = e
+
+            completed += 1
+            if callback and callable(callback) and (completed % k == 0 or completed == len(device_ids)):
+                try:
+                    await callback(completed=completed, total=len(device_ids))
+                except Exception as e:
+                    logging.exception(f"Error executing callable: {e}")
+
+        await gather_bounded(
+            *(create_pair(device_id) for device_id in device_ids),
+            limit=AppleDeveloperAccount.PROVISION_CONCURRENCY,
+        )
+        return results
 
 
     async def enable_udid(self, udid_id: str) -> dict:
@@ -330,16 +555,20 @@ class AppleDeveloperAccount:
             }
         }
 
-        async with AioHttpClient() as http_client:
-            return await http_client.request("PATCH", url, headers=headers, json=payload)
+        async with AioHttpClient(rate_limit_key=self.key_id, interactive=self.interactive) as http_client:
+            response = await http_client.request("PATCH", url, headers=headers, json=payload)
+        await ResponseCache.invalidate(self.key_id, "device", udid_id)
+        return response
 
 
     async def get_udid_info(self, udid_id: str) -> dict:
         url = AppleDeveloperAccount.API_ENDPOINT + f"/devices/{udid_id}"
-        headers = self.headers
 
-        async with AioHttpClient() as http_client:
-            return await http_client.request("GET", url, headers=headers)
+        async def fetch():
+            async with AioHttpClient(rate_limit_key=self.key_id, interactive=self.interactive) as http_client:
+                return await http_client.request("GET", url, headers=self.headers)
+
+        return await ResponseCache.fetch(self.key_id, "device", fetch, resource_id=udid_id)
 
 
 class AccountsManager:
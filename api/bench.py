@@ -0,0 +1,184 @@
+"""
+Throughput benchmarks against the local App Store Connect stand-in.
+
+    python -m api.bench import --accounts 1000 --devices 20
+    python -m api.bench register --accounts 1000 --devices 5 --latency 0.05
+    python -m api.bench due --accounts 1000 --devices 20 --database-url mongodb://localhost:27017
+
+The due scenario seeds udids that are due for their enable check and times
+the checker's due pass (load_pending and check_due) over them. It runs the
+real AccountChecker and therefore needs a MongoDB; only use a local,
+disposable instance. Seeded documents are removed afterwards.
+"""
+import time
+import uuid
+import base64
+import asyncio
+import logging
+import argparse
+from typing import List
+from datetime import datetime, timedelta, timezone
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from api.fake import FakeAppStoreConnect
+from api.key import KeyPool
+from api.session import SessionPool
+from api import AppleDeveloperAccount, DeviceType, DEVICE_FIELDS, gather_bounded
+
+
+def _p8_key() -> bytes:
+    return ec.generate_private_key(ec.SECP256R1()).private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+
+
+def _accounts(count: int) -> List[AppleDeveloperAccount]:
+    p8_file = _p8_key()
+    return [AppleDeveloperAccount(key_id=f"BENCH{no:06d}", issuer_id=str(uuid.uuid4()), p8_file=p8_file) for no in range(count)]
+
+
+async def _setup_account(account: AppleDeveloperAccount) -> dict:
+    certificate_id, _, certificate_id_dev, _ = await account.generate_certificate(password="bench")
+    app_id, _ = await account.create_app_id(account.key_id)
+    return {"certificate_id": certificate_id, "certificate_id_dev": certificate_id_dev, "app_id": app_id}
+
+
+async def bench_import(server: FakeAppStoreConnect, accounts: List[AppleDeveloperAccount], devices: int, concurrency: int):
+    for account in accounts:
+        server.add_devices(account.key_id, devices)
+
+    async def import_account(account: AppleDeveloperAccount):
+        await account.get_account_info()
+        ios_data = await account.get_devices_info(DeviceType.IOS, fields=DEVICE_FIELDS)
+        await account.get_devices_info(DeviceType.MAC_OS, fields=DEVICE_FIELDS)
+        data = await _setup_account(account)
+        enabled = [device["id"] for device in ios_data if device["attributes"]["status"] == "ENABLED"]
+        await account.create_provision_pairs(device_ids=enabled, **data)
+
+    started = time.perf_counter()
+    results = await gather_bounded(*(import_account(account) for account in accounts), limit=concurrency, return_exceptions=True)
+    return results, time.perf_counter() - started
+
+
+async def bench_register(server: FakeAppStoreConnect, accounts: List[AppleDeveloperAccount], devices: int, concurrency: int):
+    account_data = await gather_bounded(*(_setup_account(account) for account in accounts), limit=concurrency)
+    server.request_count = 0
+
+    async def register(account: AppleDeveloperAccount, data: dict):
+        udid = uuid.uuid4().hex + uuid.uuid4().hex[:8]
+        response = await account.register_udid(udid=udid, device_type=DeviceType.IOS)
+        device = (await account.get_udid_info(response["data"]["id"]))["data"]
+        if device["attributes"]["status"] == "ENABLED":
+            await account.create_provision_pair(device_id=device["id"], **data)
+
+    started = time.perf_counter()
+    results = await gather_bounded(
+        *(register(account, data) for account, data in zip(accounts, account_data) for _ in range(devices)),
+        limit=concurrency,
+        return_exceptions=True,
+    )
+    return results, time.perf_counter() - started
+
+
+async def bench_due(server: FakeAppStoreConnect, accounts: List[AppleDeveloperAccount], devices: int, concurrency: int, database_url: str):
+    from database import Database
+    from api.checker import AccountChecker, ENABLE_DELAY
+
+    db = Database(database_url, r2=None)
+    checker = AccountChecker(db=db, concurrency=concurrency)
+    # added long enough ago that apple should have enabled them, so they are due right away
+    added_date = datetime.now(timezone.utc) - timedelta(seconds=ENABLE_DELAY)
+    account_data = await gather_bounded(*(_setup_account(account) for account in accounts), limit=concurrency)
+
+    documents = []
+    for account, data in zip(accounts, account_data):
+        team = server.team(account.key_id)
+        account_id = team.user["id"]
+        documents.append(dict(
+            data,
+            account_id=account_id,
+            account_info=team.user,
+            key_id=account.key_id,
+            issue_id=account.issuer_id,
+            p8_file=base64.b64encode(account.p8_file).decode(),
+            bench=True,
+        ))
+        pending = server.add_devices(account.key_id, devices, status="PROCESSING", added_date=added_date)
+        if pending:
+            await db.udids.insert_many([dict(device, account_id=account_id, bench=True) for device in pending])
+    await db.accounts.insert_many(documents)
+
+    server.request_count = 0
+    try:
+        started = time.perf_counter()
+        await checker.load_pending()
+        await checker.check_due()
+        elapsed = time.perf_counter() - started
+
+        # one result per seeded udid, those the pass didn't get to enable count as failed
+        results = [
+            None if udid["attributes"]["status"] == "ENABLED" else RuntimeError(f"udid {udid['id']} still {udid['attributes']['status']}")
+            async for udid in db.udids.find({"bench": True}, {"id": 1, "attributes.status": 1})
+        ]
+        return results, elapsed
+    finally:
+        await db.udids.delete_many({"bench": True})
+        await db.accounts.delete_many({"bench": True})
+
+
+async def run(args: argparse.Namespace):
+    server = FakeAppStoreConnect(
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+        error_rate=args.error_rate,
+    )
+    AppleDeveloperAccount.API_ENDPOINT = await server.start()
+    SessionPool.configure(limit=args.concurrency, limit_per_host=args.concurrency)
+    await KeyPool.start()
+    accounts = _accounts(args.accounts)
+
+    try:
+        if args.scenario == "import":
+            results, elapsed = await bench_import(server, accounts, args.devices, args.concurrency)
+        elif args.scenario == "register":
+            results, elapsed = await bench_register(server, accounts, args.devices, args.concurrency)
+        else:
+            results, elapsed = await bench_due(server, accounts, args.devices, args.concurrency, args.database_url)
+    finally:
+        await SessionPool.close()
+        await KeyPool.close()
+        await server.stop()
+
+    failed = sum(isinstance(result, BaseException) for result in results)
+    print(f"scenario     : {args.scenario}")
+    print(f"operations   : {len(results)} ({failed} failed)")
+    print(f"api requests : {server.request_count}")
+    print(f"elapsed      : {elapsed:.2f}s")
+    print(f"throughput   : {len(results) / elapsed:.1f} ops/s, {server.request_count / elapsed:.1f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark account flows against a local App Store Connect stand-in.")
+    parser.add_argument("scenario", choices=["import", "register", "due"])
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--devices", type=int, default=10, help="devices per account")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--jitter", type=float, default=0)
+    parser.add_argument("--rate-limit", type=int, default=3600)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--database-url", help="disposable MongoDB used by the due scenario")
+    args = parser.parse_args()
+
+    if args.scenario == "due" and not args.database_url:
+        parser.error("the due scenario needs --database-url")
+
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import time
+import logging
+from typing import List, Optional
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+
+class BulkMetrics:
+    """Batch size and flush latency of one or more BulkWriters."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.batches = 0
+        self.operations = 0
+        self.errors = 0
+        self.max_batch = 0
+        self.flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+    def record(self, batch: int, elapsed: float, errors: int = 0):
+        self.batches += 1
+        self.operations += batch
+        self.errors += errors
+        self.max_batch = max(self.max_batch, batch)
+        self.flush_seconds += elapsed
+        self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+
+    def as_dict(self) -> dict:
+        return {
+            "batches": self.batches,
+            "operations": self.operations,
+            "errors": self.errors,
+            "avg_batch": round(self.operations / self.batches, 1) if self.batches else 0,
+            "max_batch": self.max_batch,
+            "avg_flush_ms": round(self.flush_seconds / self.batches * 1000, 1) if self.batches else 0,
+            "max_flush_ms": round(self.max_flush_seconds * 1000, 1),
+        }
+
+
+class BulkWriter:
+    """
+    Collects write operations for one collection and sends them as unordered
+    bulk_write batches of up to ``batch_size``. Several writers can share one
+    ``metrics`` object.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, batch_size: int = 500, metrics: Optional[BulkMetrics] = None):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.metrics = metrics or BulkMetrics()
+        self._operations: List[UpdateOne] = []
+
+    async def add(self, operation: UpdateOne):
+        self._operations.append(operation)
+        if len(self._operations) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self._operations:
+            return
+        operations, self._operations = self._operations, []
+
+        errors = 0
+        started = time.perf_counter()
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # unordered, so everything but the failed operations went through
+            write_errors = e.details.get("writeErrors", [])
+            errors = len(write_errors)
+            logging.error(f"{errors}/{len(operations)} writes to {self.collection.name} failed: {write_errors[:3]}")
+        finally:
+            self.metrics.record(len(operations), time.perf_counter() - started, errors)
@@ -0,0 +1,61 @@
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+import redis.asyncio as redis
+
+
+class ResponseCache:
+    """
+    Opt-in Redis cache for read-only App Store Connect lookups.
+
+    Disabled until ``configure`` is called with a redis client and the TTL
+    of every cached endpoint (config.ASC_CACHE_TTLS). Entries are namespaced
+    by key id and expire after the endpoint's TTL; endpoints without one
+    aren't cached, and mutating calls invalidate the entries they affect.
+    """
+    prefix: str = "asc"
+    ttls: Dict[str, int] = {}
+
+    client: Optional[redis.Redis] = None
+
+    @classmethod
+    def configure(cls, client: redis.Redis, ttls: Dict[str, int]):
+        cls.client = client
+        cls.ttls = dict(ttls)
+
+    @classmethod
+    def key(cls, key_id: str, endpoint: str, resource_id: Optional[str] = None) -> str:
+        if resource_id is None:
+            return f"{cls.prefix}:{key_id}:{endpoint}"
+        return f"{cls.prefix}:{key_id}:{endpoint}:{resource_id}"
+
+    @classmethod
+    async def fetch(cls, key_id: str, endpoint: str, fetch: Callable[[], Awaitable[Any]], resource_id: Optional[str] = None) -> Any:
+        ttl = cls.ttls.get(endpoint)
+        if cls.client is None or not ttl:
+            return await fetch()
+
+        key = cls.key(key_id, endpoint, resource_id)
+        try:
+            cached = await cls.client.get(key)
+            if cached is not None:
+                return json.loads(cached)
+        except Exception:
+            # a redis outage shouldn't take apple calls down with it
+            logging.exception(f"Failed to read {key} from cache")
+
+        value = await fetch()
+        try:
+            await cls.client.set(key, json.dumps(value), ex=ttl)
+        except Exception:
+            logging.exception(f"Failed to write {key} to cache")
+        return value
+
+    @classmethod
+    async def invalidate(cls, key_id: str, endpoint: str, resource_id: Optional[str] = None):
+        if cls.client is None:
+            return
+        try:
+            await cls.client.delete(cls.key(key_id, endpoint, resource_id))
+        except Exception:
+            logging.exception(f"Failed to invalidate {endpoint} cache for key {key_id}")
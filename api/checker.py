@@ -3,47 +3,163 @@ import json
 import time
 import config
 import base64
+import heapq
 import asyncio
 import logging
+from bson import ObjectId
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from pymongo import UpdateOne
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from checker import check
 from database import Database
+from api.bulk import BulkMetrics, BulkWriter
+from api.lease import LeaseManager
 from api import AppleDeveloperAccount, DeviceType
 
 status_r2 = config.STATUS_R2
 
+PENDING_STATUSES = ["PROCESSING", "INELIGIBLE"]
+# above this many pending udids they are fetched in one listing instead of one request each
+LISTING_THRESHOLD = 2
+# udids per listing, keeps the filter[id] query string short
+LISTING_CHUNK_SIZE = 100
+# same estimate headless_udid_check shows users
+ENABLE_DELAY = timedelta(days=3, hours=12).total_seconds()
+
+
+def stored_certificate_status(account_data: dict, max_age: int = config.CERTIFICATE_STATUS_MAX_AGE) -> Optional[dict]:
+    """
+    Certificate status recorded by the checker, or None when missing, stale or
+    inconclusive. ``check`` only reuses it for the certificate it was recorded
+    for, matched by ``fingerprint``.
+    """
+    certificate_status = account_data.get("certificate_status") or {}
+    if certificate_status.get("status") not in ["ENABLED", "REVOKED"] or not certificate_status.get("fingerprint"):
+        return None
+    if time.time() - certificate_status.get("checked_at", 0) > max_age:
+        return None
+    return certificate_status
+
+
+def next_check_at(udid: dict, now: float, polled: bool = True) -> float:
+    """
+    When a pending udid should be polled next.
+
+    Apple enables devices about 3.5 days after they were added, so they are
+    polled rarely before that, often around it and hourly once it's overdue
+    (or when their added date is unknown). Udids that haven't been polled
+    yet (``polled=False``) are due right away once they are inside that
+    window.
+    """
+    attributes = udid.get("attributes", {})
+    if attributes.get("status") == "INELIGIBLE":
+        return now + config.CHECKER_INELIGIBLE_INTERVAL
+
+    try:
+        added_at = datetime.fromisoformat(attributes.get("addedDate")).timestamp()
+    except (TypeError, ValueError):
+        # no idea when it was added, poll it hourly like before
+        return now + config.CHECKER_LATE_INTERVAL
+    expected = added_at + ENABLE_DELAY
+
+    if now < expected - config.CHECKER_DUE_WINDOW:
+        return min(expected - config.CHECKER_DUE_WINDOW, now + config.CHECKER_EARLY_INTERVAL)
+    if not polled:
+        return now
+    if now <= expected + config.CHECKER_DUE_WINDOW:
+        return now + config.CHECKER_DUE_INTERVAL
+    return now + config.CHECKER_LATE_INTERVAL
+
+
 class AccountChecker:
-    def __init__(self, db: Database, delay: int = 60*60):
+    def __init__(
+        self,
+        db: Database,
+        delay: int = 60*60,
+        concurrency: int = config.CHECKER_CONCURRENCY,
+        account_timeout: int = config.CHECKER_ACCOUNT_TIMEOUT,
+        leases: Optional[LeaseManager] = None,
+    ):
         self.db = db
         self.delay = delay
+        self.concurrency = concurrency
+        self.account_timeout = account_timeout
+        # shared with other checker processes when set, see api.worker
+        self.leases = leases
+
+        # pending udids as (due_at, seq, _id, account_id), soonest first
+        self._queue: List[Tuple[float, int, ObjectId, str]] = []
+        self._scheduled: Set[ObjectId] = set()
+        self._last_id: Optional[ObjectId] = None
+        self._seq = 0
+
+        # writes from the hourly sweep, flushed in batches across accounts
+        self.accounts_writer = BulkWriter(db.accounts, batch_size=config.CHECKER_BULK_BATCH_SIZE)
+        self.account_status_writer = BulkWriter(db.account_status, batch_size=config.CHECKER_BULK_BATCH_SIZE)
+        # udid writes are flushed per account, so users see them as soon as the account is done
+        self.udids_metrics = BulkMetrics()
 
     async def fetch_accounts(self):
         return self.db.accounts.find({"inactive": {"$ne": True}})
 
-    async def check_udids(self, account_data: dict):
-        dev_account = AppleDeveloperAccount(
-            key_id=account_data["key_id"],
-            issuer_id=account_data["issue_id"],
-            p8_file=base64.b64decode(account_data["p8_file"]),
-        )
+    async def update_device_counts(self, account_data: dict) -> Optional[dict]:
+        dev_account = AppleDeveloperAccount.from_account(account_data, interactive=False)
         try:
-            ios_devices = await dev_account.get_devices_info(DeviceType.IOS)
-            mac_devices = await dev_account.get_devices_info(DeviceType.MAC_OS)
-            await self.db.accounts.update_one({"_id": account_data["_id"]}, {"$set": {"ios_count": len(ios_devices), "macos_count": len(mac_devices)}})
-            pending_udids = self.db.udids.find({
-                "account_id": account_data.get("account_info", {}).get("id"),
-                "attributes.status": {"$in": ["PROCESSING", "INELIGIBLE"]}
-            })
-            async for udid in pending_udids:
+            ios_count = await dev_account.count_devices(DeviceType.IOS)
+            macos_count = await dev_account.count_devices(DeviceType.MAC_OS)
+            return {"ios_count": ios_count, "macos_count": macos_count}
+        except Exception:
+            logging.exception(f"Error while counting devices of account {account_data['_id']}")
+            return None
+
+    async def check_udids(self, account_data: dict, pending_udids: Optional[List[dict]] = None):
+        dev_account = AppleDeveloperAccount.from_account(account_data, interactive=False)
+        writer = BulkWriter(self.db.udids, batch_size=config.CHECKER_BULK_BATCH_SIZE, metrics=self.udids_metrics)
+        try:
+            if pending_udids is None:
+                pending_udids = await self.db.udids.find({
+                    "account_id": account_data.get("account_info", {}).get("id"),
+                    "attributes.status": {"$in": PENDING_STATUSES}
+                }).to_list(None)
+            if not pending_udids:
+                return True
+
+            listed = None
+            if len(pending_udids) > LISTING_THRESHOLD:
+                # a listing of just the pending udids and the fields we compare beats a request per udid
+                listed = {}
+                pending_ids = [udid.get("id") for udid in pending_udids]
+                for start in range(0, len(pending_ids), LISTING_CHUNK_SIZE):
+                    devices = dev_account.iter_devices(fields=["status", "udid"], ids=pending_ids[start:start + LISTING_CHUNK_SIZE])
+                    listed.update({device["id"]: device async for device in devices})
+
+            for udid in pending_udids:
                 try:
-                    udid_status_response = await dev_account.get_udid_info(udid.get("id"))
-                    udid_status = udid_status_response.get("data", {})
+                    if listed is None:
+                        udid_status_response = await dev_account.get_udid_info(udid.get("id"))
+                        udid_status = udid_status_response.get("data", {})
+                    else:
+                        udid_status = listed.get(udid.get("id"))
+                        if udid_status is None:
+                            logging.warning(f"Udid ({udid.get('id')}) is no longer listed in account {account_data['_id']}")
+                            continue
 
                     status = udid_status.get("attributes", {}).get("status")
+                    if status == udid.get("attributes", {}).get("status"):
+                        continue
 
+                    # the listing only carries a few fields, don't let it replace the stored attributes
+                    update = udid_status if listed is None else {"attributes.status": status}
                     if status == "ENABLED":
-                        udid_status["provision_data"] = await dev_account.create_provision(certificate_id=account_data.get('certificate_id'), device_id=udid_status.get("id"), app_id=account_data.get("app_id"))
-                        udid_status["provision_data_dev"] = await dev_account.create_provision(certificate_id=account_data.get('certificate_id_dev'), device_id=udid_status.get("id"), app_id=account_data.get("app_id"), adhoc=False)
+                        update["provision_data"], update["provision_data_dev"] = await dev_account.create_provision_pair(
+                            certificate_id=account_data.get('certificate_id'),
+                            certificate_id_dev=account_data.get('certificate_id_dev'),
+                            device_id=udid_status.get("id"),
+                            app_id=account_data.get("app_id"),
+                        )
 
-                    await self.db.udids.update_one({"_id": udid["_id"]}, {"$set": udid_status})
+                    await writer.add(UpdateOne({"_id": udid["_id"]}, {"$set": update}))
                 except Exception:
                     logging.exception(f"Error while updating udid ({udid.get('id')}) in account {account_data['_id']}")
 
@@ -51,37 +167,259 @@ class AccountChecker:
         #     await self.db.accounts.update_one({"_id": account_data["_id"]}, {"$set": {"inactive": True}})
         except Exception:
             logging.exception(f"Error while checking account {account_data['_id']}")
+            return False
+        finally:
+            try:
+                await writer.flush()
+            except Exception:
+                logging.exception(f"Error while saving udids of account {account_data['_id']}")
+        return True
+
+
+    async def check_account(self, account_data: dict) -> Optional[dict]:
+        try:
+            p12_file = base64.b64decode(account_data["p12"])
+            p12_password = config.PASSWORD
+
+            check_status = await check(
+                p12_bytes=p12_file,
+                password=p12_password,
+            )
+            certificate_status = {
+                "status": check_status.get("certificate_status"),
+                "fingerprint": check_status["certificate_info"]["fingerprint_sha256"],
+                "checked_at": time.time(),
+                "expires_at": check_status["certificate_info"].certificate.not_valid_after_utc.timestamp(),
+            }
+            attributes = account_data.get("account_info", {}).get('attributes', {})
+            first_name = attributes.get("firstName")
+            last_name = attributes.get("lastName")
+            status = certificate_status["status"] == "ENABLED"
+            await self.account_status_writer.add(UpdateOne(
+                {"pname": f"{first_name} {last_name}"},
+                {"$set": {"status": status, "certificate_status": certificate_status}},
+                upsert=True,
+            ))
+            return {"certificate_status": certificate_status}
+        except Exception:
+            logging.exception(f"Error while checking certificate of account {account_data['_id']}")
+            return None
+
+    async def process_account(self, account_data: dict) -> bool:
+        counts = await self.update_device_counts(account_data)
+        certificate = await self.check_account(account_data)
+
+        # one write per account, batched with the other accounts
+        updates = {**(counts or {}), **(certificate or {})}
+        if updates:
+            await self.accounts_writer.add(UpdateOne({"_id": account_data["_id"]}, {"$set": updates}))
+        return counts is not None and certificate is not None
+
+    async def flush(self):
+        for writer in (self.accounts_writer, self.account_status_writer):
+            try:
+                await writer.flush()
+            except Exception:
+                logging.exception(f"Error while saving {writer.collection.name}")
+
+    @staticmethod
+    def write_metrics(**metrics: BulkMetrics) -> dict:
+        # reported once per run, then started over
+        summary = {name: collection_metrics.as_dict() for name, collection_metrics in metrics.items()}
+        for collection_metrics in metrics.values():
+            collection_metrics.reset()
+        return summary
+
+    async def run_workers(
+        self,
+        accounts,
+        handler: Optional[Callable[[dict], Awaitable[bool]]] = None,
+        task: Optional[str] = None,
+        cooldown: float = 0,
+        on_skip: Optional[Callable[[dict], Awaitable[None]]] = None,
+    ) -> dict:
+        """
+        Feed ``accounts`` (any async iterable) through ``concurrency`` workers,
+        giving each account at most ``account_timeout`` seconds in ``handler``
+        (process_account by default).
 
+        With leases configured, an account is only handled after claiming its
+        ``account:{_id}`` lease, which every task shares; accounts another
+        worker holds are skipped (and passed to ``on_skip``). After a
+        successful check a ``{task}:{_id}`` cooldown is set for ``cooldown``
+        seconds, and accounts another worker checked that recently are
+        skipped the same way.
+        """
+        handler = handler or self.process_account
+        summary = {"checked": 0, "failed": 0, "timed_out": 0, "skipped": 0}
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
 
-    # async def check_account(self, account_data: dict):
-    #     p12_file = base64.b64decode(account_data["p12"])
-    #     p12_password = config.PASSWORD
+        async def skip(account_data: dict):
+            summary["skipped"] += 1
+            if on_skip is not None:
+                await on_skip(account_data)
 
-    #     check_status = check(
-    #         p12_bytes=p12_file,
-    #         password=p12_password,
-    #     )
-    #     attributes = account_data.get("account_info", {}).get('attributes', {})
-    #     first_name = attributes.get("firstName")
-    #     last_name = attributes.get("lastName")
-    #     status = check_status.get('certificate_status') == "ENABLED"
-    #     await self.db.account_status.update_one({"pname": f"{first_name} {last_name}"}, {"$set": {"status": status}}, upsert=True)
+        async def handle(account_data: dict) -> bool:
+            if self.leases is None:
+                return await asyncio.wait_for(handler(account_data), timeout=self.account_timeout)
 
+            name = f"account:{account_data['_id']}"
+            marker = f"{task}:{account_data['_id']}"
+            if task and cooldown and await self.leases.cooling_down(marker):
+                return await skip(account_data)
+            if not await self.leases.claim(name):
+                return await skip(account_data)
+
+            heartbeat = self.leases.heartbeat(name)
+            try:
+                ok = await asyncio.wait_for(handler(account_data), timeout=self.account_timeout)
+                if ok and task and cooldown:
+                    # set before the lease goes, so nobody slips in between
+                    await self.leases.cool_down(marker, cooldown)
+                return ok
+            finally:
+                heartbeat.cancel()
+                await self.leases.release(name)
+
+        async def worker():
+            while True:
+                account_data = await queue.get()
+                try:
+                    ok = await handle(account_data)
+                    if ok:
+                        summary["checked"] += 1
+                    elif ok is not None:
+                        summary["failed"] += 1
+                except asyncio.TimeoutError:
+                    summary["timed_out"] += 1
+                    logging.warning(f"Checking account {account_data['_id']} took longer than {self.account_timeout} seconds, skipped")
+                except Exception:
+                    summary["failed"] += 1
+                    logging.exception(f"Error while checking account {account_data['_id']}")
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            async for account_data in accounts:
+                await queue.put(account_data)
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return summary
+
+
+    def schedule(self, udid: dict, now: Optional[float] = None, polled: bool = True):
+        if udid["_id"] in self._scheduled:
+            return
+        due_at = next_check_at(udid, now or time.time(), polled)
+        self._seq += 1
+        heapq.heappush(self._queue, (due_at, self._seq, udid["_id"], udid.get("account_id")))
+        self._scheduled.add(udid["_id"])
+
+    async def load_pending(self, full: bool = False):
+        """
+        Queue pending udids that aren't queued yet; all of them on ``full``,
+        otherwise only documents added since the last load. Udids already
+        queued keep their due time.
+        """
+        query = {"attributes.status": {"$in": PENDING_STATUSES}}
+        last_id = self._last_id
+        if not full and last_id is not None:
+            query["_id"] = {"$gt": last_id}
+
+        now = time.time()
+        async for udid in self.db.udids.find(query, {"attributes.addedDate": 1, "attributes.status": 1, "account_id": 1}).sort("_id", 1):
+            # only documents the checker hasn't seen before are due right away
+            new = last_id is None or udid["_id"] > last_id
+            self.schedule(udid, now, polled=not new)
+            if self._last_id is None or udid["_id"] > self._last_id:
+                self._last_id = udid["_id"]
+
+    async def check_due(self):
+        """Check the udids whose next poll is due, grouped by account. Accounts with nothing due are skipped."""
+        try:
+            await self.load_pending()
+
+            now = time.time()
+            due: Dict[str, List[ObjectId]] = {}
+            while self._queue and self._queue[0][0] <= now:
+                _, _, udid_id, account_id = heapq.heappop(self._queue)
+                self._scheduled.discard(udid_id)
+                due.setdefault(account_id, []).append(udid_id)
+            if not due:
+                return
+
+            t = time.time()
+            accounts = self.db.accounts.find({"account_info.id": {"$in": list(due)}, "inactive": {"$ne": True}})
+
+            async def reschedule(account_data: dict):
+                # another worker has the account, poll again at the next interval
+                udids = self.db.udids.find({"_id": {"$in": due[account_data["account_info"]["id"]]}}, {"attributes.addedDate": 1, "attributes.status": 1, "account_id": 1})
+                async for udid in udids:
+                    self.schedule(udid)
+
+            async def check_account_udids(account_data: dict) -> bool:
+                udid_ids = due[account_data["account_info"]["id"]]
+                # re-read them, some may have changed since they were queued
+                pending_udids = await self.db.udids.find({"_id": {"$in": udid_ids}, "attributes.status": {"$in": PENDING_STATUSES}}).to_list(None)
+                try:
+                    return await self.check_udids(account_data, pending_udids)
+                finally:
+                    still_pending = self.db.udids.find({"_id": {"$in": udid_ids}, "attributes.status": {"$in": PENDING_STATUSES}}, {"attributes.addedDate": 1, "attributes.status": 1, "account_id": 1})
+                    async for udid in still_pending:
+                        self.schedule(udid)
+
+            summary = await self.run_workers(
+                accounts,
+                handler=check_account_udids,
+                task="udids",
+                cooldown=config.CHECKER_TICK_INTERVAL,
+                on_skip=reschedule,
+            )
+            summary["writes"] = self.write_metrics(udids=self.udids_metrics)
+            logging.info(
+                f"Checked due udids of {summary['checked']}/{len(due)} accounts in {round(time.time() - t, 2)} seconds "
+                f"({summary['failed']} failed, {summary['timed_out']} timed out, {summary['skipped']} left to other workers, "
+                f"{len(self._queue)} udids queued), writes: {summary['writes']}"
+            )
+            return summary
+        except Exception:
+            logging.exception("An error occurred while checking due udids")
+
+    def add_jobs(self, scheduler: AsyncIOScheduler):
+        scheduler.add_job(
+            self.start_checking,
+            trigger="cron",
+            hour="*",
+            id="account_checker",
+            max_instances=1,
+        )
+        scheduler.add_job(
+            self.check_due,
+            trigger="interval",
+            seconds=config.CHECKER_TICK_INTERVAL,
+            id="udid_checker",
+            max_instances=1,
+            next_run_time=datetime.now(timezone.utc),
+        )
 
     async def start_checking(self):
         logging.info("Starting account checker...")
         try:
+            # pick up udids that went back to pending under an old _id
+            await self.load_pending(full=True)
+
             accounts = await self.fetch_accounts()
             t = time.time()
 
-            account_list = [account async for account in accounts]
-            logging.info(f"Checking {len(account_list)} accounts...")
-
-            tasks = [self.check_udids(account) for account in account_list]
-            await asyncio.gather(*tasks)
-
-            # account_tasks = [self.check_account(account) for account in account_list]
-            # await asyncio.gather(*account_tasks)
+            try:
+                summary = await self.run_workers(accounts, task="sweep", cooldown=config.CHECKER_SWEEP_COOLDOWN)
+            finally:
+                await self.flush()
+            summary["writes"] = self.write_metrics(accounts=self.accounts_writer.metrics, account_status=self.account_status_writer.metrics)
 
             # data = {
             #     "status": [],
@@ -96,6 +434,12 @@ class AccountChecker:
             #     url = await status_r2.upload_file(file=data_stream, path="certificates2.json")
             #     logging.debug(f"Uploaded data to {url}")
 
-            logging.info(f"Checked {len(tasks)} accounts in {time.time() - t} seconds!")
+            summary["duration"] = round(time.time() - t, 2)
+            logging.info(
+                f"Checked {summary['checked']} accounts in {summary['duration']} seconds! "
+                f"({summary['failed']} failed, {summary['timed_out']} timed out, {summary['skipped']} left to other workers), "
+                f"writes: {summary['writes']}"
+            )
+            return summary
         except Exception:
             logging.exception("An error occurred")
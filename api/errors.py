@@ -11,4 +11,8 @@ class Forbidden(Exception):
 
 
 class Conflict(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+class RateLimited(Exception):
+    pass
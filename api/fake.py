@@ -0,0 +1,422 @@
+"""
+Local stand-in for the parts of the App Store Connect API we use.
+
+Run it with ``python -m api.fake --port 8080`` and point the bot at it with
+``ASC_API_ENDPOINT=http://localhost:8080/v1``. Any key id is accepted; each
+one gets its own in-memory team, created on first use.
+"""
+import jwt
+import time
+import uuid
+import random
+import base64
+import asyncio
+import logging
+import argparse
+import plistlib
+from aiohttp import web
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import pkcs7
+
+
+DEVICE_CLASSES = {"IOS": ["IPHONE", "IPAD"], "MAC_OS": ["MAC"]}
+
+
+@dataclass
+class FakeTeam:
+    key_id: str
+    user: dict
+    devices: Dict[str, dict] = field(default_factory=dict)
+    certificates: Dict[str, dict] = field(default_factory=dict)
+    bundle_ids: Dict[str, dict] = field(default_factory=dict)
+    profiles: Dict[str, dict] = field(default_factory=dict)
+    window_started_at: float = field(default_factory=time.monotonic)
+    requests_in_window: int = 0
+
+
+def _resource(type_: str, id_: str, attributes: dict) -> dict:
+    return {"type": type_, "id": id_, "attributes": attributes}
+
+
+def _error(status: int, detail: str) -> web.Response:
+    return web.json_response({"errors": [{"status": str(status), "detail": detail}]}, status=status)
+
+
+class FakeAppStoreConnect:
+    """
+    :param latency: seconds added to every response
+    :param jitter: random extra latency, up to this many seconds
+    :param rate_limit: requests per key per rate limit window
+    :param rate_limit_window: length of the rate limit window in seconds
+    :param error_rate: fraction of requests answered with ``error_status``
+    :param error_status: status code used for injected errors
+    :param enable_after: seconds before a registered device moves from PROCESSING to ENABLED
+    """
+
+    def __init__(
+        self,
+        latency: float = 0,
+        jitter: float = 0,
+        rate_limit: int = 3600,
+        rate_limit_window: float = 60 * 60,
+        error_rate: float = 0,
+        error_status: int = 500,
+        enable_after: float = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.enable_after = enable_after
+
+        self.teams: Dict[str, FakeTeam] = {}
+        self.request_count = 0
+        self._runner: Optional[web.AppRunner] = None
+        self.url: Optional[str] = None
+
+        self._ca_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self._ca_name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "Fake Worldwide Developer Relations Certification Authority")])
+
+    # -- state helpers --
+
+    def team(self, key_id: str) -> FakeTeam:
+        if key_id not in self.teams:
+            self.teams[key_id] = FakeTeam(
+                key_id=key_id,
+                user=_resource("users", uuid.uuid4().hex, {
+                    "username": f"{key_id.lower()}@example.com",
+                    "firstName": "Fake",
+                    "lastName": key_id,
+                    "roles": ["ACCOUNT_HOLDER"],
+                }),
+            )
+        return self.teams[key_id]
+
+    def add_devices(self, key_id: str, count: int, platform: str = "IOS", status: str = "ENABLED", added_date: Optional[datetime] = None) -> List[dict]:
+        team = self.team(key_id)
+        devices = []
+        for _ in range(count):
+            device = self._new_device(platform=platform, udid=uuid.uuid4().hex + uuid.uuid4().hex[:8], status=status, added_date=added_date)
+            team.devices[device["id"]] = device
+            devices.append(device)
+        return devices
+
+    def _new_device(self, platform: str, udid: str, status: str, added_date: Optional[datetime] = None) -> dict:
+        added_date = added_date or datetime.now(timezone.utc)
+        return _resource("devices", uuid.uuid4().hex[:10].upper(), {
+            "name": udid,
+            "platform": platform,
+            "udid": udid,
+            "deviceClass": random.choice(DEVICE_CLASSES.get(platform, ["IPHONE"])),
+            "status": status,
+            "model": "iPhone 15" if platform == "IOS" else "MacBook Pro",
+            "addedDate": added_date.isoformat(timespec="milliseconds"),
+        })
+
+    def _refresh_status(self, device: dict):
+        attributes = device["attributes"]
+        if attributes["status"] == "PROCESSING":
+            added = datetime.fromisoformat(attributes["addedDate"])
+            if datetime.now(timezone.utc) - added >= timedelta(seconds=self.enable_after):
+                attributes["status"] = "ENABLED"
+
+    def _certificate(self, csr_pem: str) -> x509.Certificate:
+        csr = x509.load_pem_x509_csr(csr_pem.encode())
+        now = datetime.now(timezone.utc)
+        return (
+            x509.CertificateBuilder()
+            .subject_name(csr.subject)
+            .issuer_name(self._ca_name)
+            .public_key(csr.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now)
+            .not_valid_after(now + timedelta(days=365))
+            .sign(self._ca_key, hashes.SHA256())
+        )
+
+    def _profile_content(self, team: FakeTeam, profile_type: str, certificate: dict, devices: List[dict], bundle_id: dict) -> str:
+        now = datetime.now(timezone.utc)
+        plist = plistlib.dumps({
+            "AppIDName": bundle_id["attributes"]["name"],
+            "CreationDate": now,
+            "ExpirationDate": now + timedelta(days=365),
+            "DeveloperCertificates": [base64.b64decode(certificate["attributes"]["certificateContent"])],
+            "Entitlements": {
+                "application-identifier": f"{team.key_id}.{bundle_id['attributes']['identifier']}",
+                "get-task-allow": profile_type == "IOS_APP_DEVELOPMENT",
+            },
+            "ProvisionedDevices": [device["attributes"]["udid"] for device in devices],
+            "TeamIdentifier": [team.key_id],
+            "UUID": str(uuid.uuid4()),
+        })
+        # signed like the real thing so the checker can parse it
+        ca_cert = (
+            x509.CertificateBuilder()
+            .subject_name(self._ca_name)
+            .issuer_name(self._ca_name)
+            .public_key(self._ca_key.public_key())
+            .serial_number(1)
+            .not_valid_before(now - timedelta(days=1))
+            .not_valid_after(now + timedelta(days=3650))
+            .sign(self._ca_key, hashes.SHA256())
+        )
+        signed = (
+            pkcs7.PKCS7SignatureBuilder()
+            .set_data(plist)
+            .add_signer(ca_cert, self._ca_key, hashes.SHA256())
+            .sign(serialization.Encoding.DER, [pkcs7.PKCS7Options.Binary])
+        )
+        return base64.b64encode(signed).decode()
+
+    # -- middleware --
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler):
+        self.request_count += 1
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+
+        try:
+            token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+            key_id = jwt.get_unverified_header(token)["kid"]
+        except Exception:
+            return _error(401, "Provide a properly configured and signed bearer token.")
+
+        team = self.team(key_id)
+        now = time.monotonic()
+        if now - team.window_started_at >= self.rate_limit_window:
+            team.window_started_at, team.requests_in_window = now, 0
+        team.requests_in_window += 1
+        remaining = max(self.rate_limit - team.requests_in_window, 0)
+        rate_headers = {"X-Rate-Limit": f"user-hour-lim:{self.rate_limit};user-hour-rem:{remaining};"}
+
+        if team.requests_in_window > self.rate_limit:
+            response = _error(429, "The request rate limit has been reached.")
+        elif self.error_rate and random.random() < self.error_rate:
+            response = _error(self.error_status, "Injected error.")
+        else:
+            request["team"] = team
+            response = await handler(request)
+
+        response.headers.update(rate_headers)
+        return response
+
+    # -- handlers --
+
+    async def get_users(self, request: web.Request):
+        return web.json_response({"data": [request["team"].user]})
+
+    async def list_devices(self, request: web.Request):
+        team: FakeTeam = request["team"]
+        query = request.query
+        platforms = query.get("filter[platform]", "").split(",") if "filter[platform]" in query else None
+        statuses = query.get("filter[status]", "").split(",") if "filter[status]" in query else None
+        ids = query.get("filter[id]", "").split(",") if "filter[id]" in query else None
+        fields = query.get("fields[devices]", "").split(",") if "fields[devices]" in query else None
+        limit = min(int(query.get("limit", 20)), 200)
+        cursor = int(query.get("cursor", 0))
+
+        devices = []
+        for device in team.devices.values():
+            self._refresh_status(device)
+            attributes = device["attributes"]
+            if platforms and attributes["platform"] not in platforms:
+                continue
+            if statuses and attributes["status"] not in statuses:
+                continue
+            if ids and device["id"] not in ids:
+                continue
+            devices.append(device)
+
+        page = devices[cursor:cursor + limit]
+        if fields:
+            page = [_resource("devices", device["id"], {k: v for k, v in device["attributes"].items() if k in fields}) for device in page]
+
+        links = {"self": str(request.url)}
+        if cursor + limit < len(devices):
+            links["next"] = str(request.url.update_query(cursor=cursor + limit))
+        return web.json_response({"data": page, "links": links, "meta": {"paging": {"total": len(devices), "limit": limit}}})
+
+    async def register_device(self, request: web.Request):
+        team: FakeTeam = request["team"]
+        attributes = (await request.json())["data"]["attributes"]
+        if any(device["attributes"]["udid"].lower() == attributes["udid"].lower() for device in team.devices.values()):
+            return _error(409, "A device with this number already exists on this team.")
+
+        status = "PROCESSING" if self.enable_after else "ENABLED"
+        device = self._new_device(platform=attributes["platform"], udid=attributes["udid"], status=status)
+        team.devices[device["id"]] = device
+        return web.json_response({"data": device}, status=201)
+
+    async def get_device(self, request: web.Request):
+        device = request["team"].devices.get(request.match_info["id"])
+        if not device:
+            return _error(404, "There is no resource of type 'devices' with id")
+        self._refresh_status(device)
+        return web.json_response({"data": device})
+
+    async def update_device(self, request: web.Request):
+        device = request["team"].devices.get(request.match_info["id"])
+        if not device:
+            return _error(404, "There is no resource of type 'devices' with id")
+        device["attributes"].update((await request.json())["data"].get("attributes", {}))
+        return web.json_response({"data": device})
+
+    async def list_certificates(self, request: web.Request):
+        return web.json_response({"data": list(request["team"].certificates.values())})
+
+    async def get_certificate(self, request: web.Request):
+        certificate = request["team"].certificates.get(request.match_info["id"])
+        if not certificate:
+            return _error(404, "There is no resource of type 'certificates' with id")
+        return web.json_response({"data": certificate})
+
+    async def create_certificate(self, request: web.Request):
+        team: FakeTeam = request["team"]
+        attributes = (await request.json())["data"]["attributes"]
+        cert = self._certificate(attributes["csrContent"])
+        certificate = _resource("certificates", uuid.uuid4().hex[:10].upper(), {
+            "certificateType": attributes["certificateType"],
+            "certificateContent": base64.b64encode(cert.public_bytes(serialization.Encoding.DER)).decode(),
+            "serialNumber": format(cert.serial_number, "X"),
+            "expirationDate": cert.not_valid_after_utc.isoformat(),
+        })
+        team.certificates[certificate["id"]] = certificate
+        return web.json_response({"data": certificate}, status=201)
+
+    async def delete_certificate(self, request: web.Request):
+        if request["team"].certificates.pop(request.match_info["id"], None) is None:
+            return _error(404, "There is no resource of type 'certificates' with id")
+        return web.Response(status=204)
+
+    async def list_bundle_ids(self, request: web.Request):
+        name = request.query.get("filter[name]")
+        bundle_ids = [b for b in request["team"].bundle_ids.values() if name is None or b["attributes"]["name"] == name]
+        return web.json_response({"data": bundle_ids})
+
+    async def create_bundle_id(self, request: web.Request):
+        team: FakeTeam = request["team"]
+        attributes = (await request.json())["data"]["attributes"]
+        if any(b["attributes"]["identifier"] == attributes["identifier"] for b in team.bundle_ids.values()):
+            return _error(409, "An App ID with Identifier is not available.")
+        bundle_id = _resource("bundleIds", uuid.uuid4().hex[:10].upper(), dict(attributes, capabilities=[]))
+        team.bundle_ids[bundle_id["id"]] = bundle_id
+        return web.json_response({"data": bundle_id}, status=201)
+
+    async def delete_bundle_id(self, request: web.Request):
+        if request["team"].bundle_ids.pop(request.match_info["id"], None) is None:
+            return _error(404, "There is no resource of type 'bundleIds' with id")
+        return web.Response(status=204)
+
+    async def create_capability(self, request: web.Request):
+        data = (await request.json())["data"]
+        bundle_id = request["team"].bundle_ids.get(data["relationships"]["bundleId"]["data"]["id"])
+        if not bundle_id:
+            return _error(404, "There is no resource of type 'bundleIds' with id")
+        capability = _resource("bundleIdCapabilities", uuid.uuid4().hex[:10].upper(), data["attributes"])
+        bundle_id["attributes"]["capabilities"].append(capability)
+        return web.json_response({"data": capability}, status=201)
+
+    async def create_profile(self, request: web.Request):
+        team: FakeTeam = request["team"]
+        data = (await request.json())["data"]
+        relationships = data["relationships"]
+        bundle_id = team.bundle_ids.get(relationships["bundleId"]["data"]["id"])
+        certificates = [team.certificates.get(c["id"]) for c in relationships["certificates"]["data"]]
+        devices = [team.devices.get(d["id"]) for d in relationships["devices"]["data"]]
+        if not bundle_id or not all(certificates) or not all(devices):
+            return _error(409, "The provided entity includes a relationship with an invalid value.")
+
+        now = datetime.now(timezone.utc)
+        profile_type = data["attributes"]["profileType"]
+        profile = _resource("profiles", uuid.uuid4().hex[:10].upper(), {
+            "name": data["attributes"]["name"],
+            "platform": "IOS",
+            "profileType": profile_type,
+            "profileState": "ACTIVE",
+            "profileContent": self._profile_content(team, profile_type, certificates[0], devices, bundle_id),
+            "uuid": str(uuid.uuid4()),
+            "createdDate": now.isoformat(),
+            "expirationDate": (now + timedelta(days=365)).isoformat(),
+        })
+        team.profiles[profile["id"]] = profile
+        return web.json_response({"data": profile}, status=201)
+
+    async def delete_profile(self, request: web.Request):
+        if request["team"].profiles.pop(request.match_info["id"], None) is None:
+            return _error(404, "There is no resource of type 'profiles' with id")
+        return web.Response(status=204)
+
+    # -- lifecycle --
+
+    def application(self) -> web.Application:
+        app = web.Application(middlewares=[self.middleware])
+        app.router.add_routes([
+            web.get("/v1/users", self.get_users),
+            web.get("/v1/devices", self.list_devices),
+            web.post("/v1/devices", self.register_device),
+            web.get("/v1/devices/{id}", self.get_device),
+            web.patch("/v1/devices/{id}", self.update_device),
+            web.get("/v1/certificates", self.list_certificates),
+            web.post("/v1/certificates", self.create_certificate),
+            web.get("/v1/certificates/{id}", self.get_certificate),
+            web.delete("/v1/certificates/{id}", self.delete_certificate),
+            web.get("/v1/bundleIds", self.list_bundle_ids),
+            web.post("/v1/bundleIds", self.create_bundle_id),
+            web.delete("/v1/bundleIds/{id}", self.delete_bundle_id),
+            web.post("/v1/bundleIdCapabilities", self.create_capability),
+            web.post("/v1/profiles", self.create_profile),
+            web.delete("/v1/profiles/{id}", self.delete_profile),
+        ])
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.application(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{bound_port}/v1"
+        logging.info(f"Fake App Store Connect listening on {self.url}")
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local App Store Connect stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0, help="random extra latency in seconds")
+    parser.add_argument("--rate-limit", type=int, default=3600, help="requests per key per hour")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--enable-after", type=float, default=0, help="seconds before new devices are ENABLED")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = FakeAppStoreConnect(
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        enable_after=args.enable_after,
+    )
+    web.run_app(server.application(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,12 @@ from cryptography.hazmat.primitives import hashes
 from cryptography.x509.oid import NameOID
 import cryptography.x509 as x509
 import io
-from typing import Tuple
+import config
+import asyncio
+import multiprocessing
+import logging
+from typing import Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor
 from cryptography.hazmat.primitives.serialization import (
     BestAvailableEncryption,
     pkcs12,
@@ -59,3 +64,78 @@ class KeyManager:
             encryption_algorithm=BestAvailableEncryption(password.encode()),
         )
         return pfx
+
+
+class KeyPool:
+    """
+    Background pool of pre-generated RSA key / CSR pairs.
+
+    Keys are generated in a process pool and topped back up whenever the
+    queue drops to ``low_water`` entries, so certificate creation never
+    runs RSA generation on the event loop.
+    """
+    size: int = config.KEY_POOL_SIZE
+    low_water: int = config.KEY_POOL_LOW_WATER
+    workers: int = config.KEY_POOL_WORKERS
+
+    _queue: Optional[asyncio.Queue] = None
+    _executor: Optional[ProcessPoolExecutor] = None
+    _refill_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def start(cls, size: Optional[int] = None, low_water: Optional[int] = None, workers: Optional[int] = None):
+        if size is not None:
+            cls.size = size
+        if low_water is not None:
+            cls.low_water = low_water
+        if workers is not None:
+            cls.workers = workers
+
+        cls._queue = asyncio.Queue(maxsize=cls.size)
+        # spawned, not forked: by now the process has an event loop and open database clients
+        cls._executor = ProcessPoolExecutor(max_workers=cls.workers, mp_context=multiprocessing.get_context("spawn"))
+        cls._schedule_refill()
+
+    @classmethod
+    async def close(cls):
+        if cls._refill_task is not None:
+            cls._refill_task.cancel()
+            cls._refill_task = None
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+        cls._queue = None
+
+    @classmethod
+    async def get(cls) -> Tuple[bytes, bytes]:
+        if cls._queue is None:
+            # pool not started (scripts, tests), still keep the loop free
+            return await asyncio.to_thread(KeyManager.generate_keys)
+
+        try:
+            keys = cls._queue.get_nowait()
+        except asyncio.QueueEmpty:
+            keys = await asyncio.get_running_loop().run_in_executor(cls._executor, KeyManager.generate_keys)
+
+        if cls._queue.qsize() <= cls.low_water:
+            cls._schedule_refill()
+        return keys
+
+    @classmethod
+    def _schedule_refill(cls):
+        if cls._refill_task is None or cls._refill_task.done():
+            cls._refill_task = asyncio.create_task(cls._refill())
+
+    @classmethod
+    async def _refill(cls):
+        loop = asyncio.get_running_loop()
+        while cls._queue is not None and not cls._queue.full():
+            try:
+                keys = await loop.run_in_executor(cls._executor, KeyManager.generate_keys)
+            except Exception:
+                logging.exception("Failed to pre-generate key pair")
+                return
+            if cls._queue is None or cls._queue.full():
+                return
+            cls._queue.put_nowait(keys)
+        logging.debug(f"Key pool refilled to {cls.size} pairs")
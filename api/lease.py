@@ -0,0 +1,96 @@
+import uuid
+import socket
+import asyncio
+import logging
+from typing import Optional
+import redis.asyncio as redis
+
+
+# only touch the key while we still own it
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class LeaseManager:
+    """
+    Redis leases that let any number of checker processes share the accounts.
+
+    A lease is a key holding the owner's id with a ``ttl`` second expiry,
+    claimed with SET NX, kept alive by a heartbeat and released through Lua
+    scripts that only act while we still own it. If a worker dies its leases
+    simply expire and another worker picks the accounts up.
+
+    Cooldowns are separate marker keys that say some work was done recently,
+    so other workers don't repeat it once the lease is released. A worker
+    never cools down on its own markers, it knows what it already did.
+    """
+    prefix: str = "checker:lease"
+    cooldown_prefix: str = "checker:cooldown"
+
+    def __init__(self, client: redis.Redis, ttl: int = 60, owner: Optional[str] = None):
+        self.client = client
+        self.ttl = ttl
+        self.owner = owner or f"{socket.gethostname()}:{uuid.uuid4().hex[:8]}"
+        self._renew = client.register_script(RENEW_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+
+    def key(self, name: str) -> str:
+        return f"{self.prefix}:{name}"
+
+    async def claim(self, name: str) -> bool:
+        try:
+            return bool(await self.client.set(self.key(name), self.owner, nx=True, px=self.ttl * 1000))
+        except Exception:
+            # without redis we can't tell who owns what, so nobody checks it
+            logging.exception(f"Failed to claim lease {name}")
+            return False
+
+    async def renew(self, name: str) -> bool:
+        return bool(await self._renew(keys=[self.key(name)], args=[self.owner, self.ttl * 1000]))
+
+    async def release(self, name: str) -> bool:
+        try:
+            return bool(await self._release(keys=[self.key(name)], args=[self.owner]))
+        except Exception:
+            logging.exception(f"Failed to release lease {name}")
+            return False
+
+    async def cool_down(self, name: str, seconds: float):
+        try:
+            await self.client.set(f"{self.cooldown_prefix}:{name}", self.owner, px=int(seconds * 1000))
+        except Exception:
+            logging.exception(f"Failed to set cooldown {name}")
+
+    async def cooling_down(self, name: str) -> bool:
+        try:
+            owner = await self.client.get(f"{self.cooldown_prefix}:{name}")
+            if isinstance(owner, bytes):
+                owner = owner.decode()
+            return owner is not None and owner != self.owner
+        except Exception:
+            logging.exception(f"Failed to read cooldown {name}")
+            return False
+
+    def heartbeat(self, name: str) -> asyncio.Task:
+        async def beat():
+            while True:
+                await asyncio.sleep(self.ttl / 3)
+                try:
+                    if not await self.renew(name):
+                        logging.warning(f"Lost lease {name}, another worker may pick it up")
+                        return
+                except Exception:
+                    logging.exception(f"Failed to renew lease {name}")
+
+        return asyncio.create_task(beat())
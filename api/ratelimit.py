@@ -0,0 +1,105 @@
+import time
+import asyncio
+import logging
+from typing import Dict, Optional, Mapping
+
+
+def parse_rate_limit_header(value: str) -> Dict[str, int]:
+    # X-Rate-Limit: user-hour-lim:3600;user-hour-rem:3599;
+    parsed = {}
+    for part in value.split(";"):
+        name, _, number = part.strip().partition(":")
+        if name and number.strip().isdigit():
+            parsed[name] = int(number)
+    return parsed
+
+
+class TokenBucket:
+    def __init__(self, capacity: int, period: float = 60 * 60):
+        self.capacity = capacity
+        self.period = period
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        # one queue per reserve, so callers with a smaller reserve never wait behind bigger ones
+        self.locks: Dict[int, asyncio.Lock] = {}
+
+    @property
+    def refill_rate(self) -> float:
+        return self.capacity / self.period
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    async def acquire(self, reserve: int = 0):
+        # the lock keeps waiters with the same reserve in arrival order
+        async with self.locks.setdefault(reserve, asyncio.Lock()):
+            while True:
+                self._refill()
+                if self.tokens - reserve >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 + reserve - self.tokens) / self.refill_rate)
+
+    def sync(self, limit: int, remaining: int):
+        self._refill()
+        if limit and limit != self.capacity:
+            self.capacity = limit
+        # trust apple's count, it also includes requests made by other processes
+        self.tokens = min(float(remaining), self.capacity)
+
+    @property
+    def remaining(self) -> int:
+        self._refill()
+        return int(self.tokens)
+
+
+class RateLimiter:
+    """
+    Per-key token buckets mirroring App Store Connect's hourly request quota.
+
+    Buckets start at ``default_limit`` and are corrected from the
+    ``X-Rate-Limit`` header of every response. Background requests leave
+    ``reserve`` requests in the bucket, so interactive handlers (which
+    acquire with ``reserve=0``) still get through while a batch job drains
+    the budget.
+    """
+    default_limit: int = 3600
+    reserve: int = 10
+
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def bucket(self, key: str) -> TokenBucket:
+        if key not in self._buckets:
+            self._buckets[key] = TokenBucket(capacity=self.default_limit)
+        return self._buckets[key]
+
+    async def acquire(self, key: Optional[str], reserve: Optional[int] = None):
+        if key is None:
+            return
+        if reserve is None:
+            reserve = self.reserve
+        bucket = self.bucket(key)
+        if bucket.remaining <= reserve:
+            logging.info(f"Rate limit budget low for key {key}, queueing request")
+        await bucket.acquire(reserve=reserve)
+
+    def update(self, key: Optional[str], headers: Mapping[str, str]):
+        value = headers.get("X-Rate-Limit")
+        if key is None or not value:
+            return
+        parsed = parse_rate_limit_header(value)
+        if "user-hour-rem" in parsed:
+            self.bucket(key).sync(limit=parsed.get("user-hour-lim", 0), remaining=parsed["user-hour-rem"])
+
+    def exhaust(self, key: Optional[str]):
+        # called on a 429, apple says the budget is gone whatever we think
+        if key is not None:
+            bucket = self.bucket(key)
+            bucket.sync(limit=bucket.capacity, remaining=0)
+
+    def budget(self, key: str) -> Dict[str, int]:
+        bucket = self.bucket(key)
+        return {"limit": bucket.capacity, "remaining": bucket.remaining}
@@ -0,0 +1,69 @@
+import config
+import aiohttp
+import logging
+from typing import Optional
+
+
+class SessionPool:
+    """
+    Process-wide aiohttp session shared by every App Store Connect request.
+
+    Keeps connections to api.appstoreconnect.apple.com alive between calls so
+    that account methods don't pay a fresh TCP+TLS handshake per request.
+    """
+    limit: int = config.HTTP_POOL_LIMIT
+    limit_per_host: int = config.HTTP_POOL_LIMIT_PER_HOST
+    dns_cache_ttl: int = config.HTTP_DNS_CACHE_TTL
+    keepalive_timeout: float = config.HTTP_KEEPALIVE_TIMEOUT
+    timeout: float = config.HTTP_TIMEOUT
+
+    _session: Optional[aiohttp.ClientSession] = None
+
+    @classmethod
+    def configure(
+        cls,
+        limit: Optional[int] = None,
+        limit_per_host: Optional[int] = None,
+        dns_cache_ttl: Optional[int] = None,
+        keepalive_timeout: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ):
+        if limit is not None:
+            cls.limit = limit
+        if limit_per_host is not None:
+            cls.limit_per_host = limit_per_host
+        if dns_cache_ttl is not None:
+            cls.dns_cache_ttl = dns_cache_ttl
+        if keepalive_timeout is not None:
+            cls.keepalive_timeout = keepalive_timeout
+        if timeout is not None:
+            cls.timeout = timeout
+
+    @classmethod
+    async def start(cls, **kwargs) -> aiohttp.ClientSession:
+        cls.configure(**kwargs)
+        return cls.get()
+
+    @classmethod
+    def get(cls) -> aiohttp.ClientSession:
+        # created lazily so scripts that never call start() still share one pool
+        if cls._session is None or cls._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=cls.limit,
+                limit_per_host=cls.limit_per_host,
+                ttl_dns_cache=cls.dns_cache_ttl,
+                keepalive_timeout=cls.keepalive_timeout,
+            )
+            cls._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=cls.timeout),
+            )
+            logging.info(f"Opened shared HTTP session (limit={cls.limit}, limit_per_host={cls.limit_per_host})")
+        return cls._session
+
+    @classmethod
+    async def close(cls):
+        if cls._session is not None and not cls._session.closed:
+            await cls._session.close()
+            logging.info("Closed shared HTTP session")
+        cls._session = None
@@ -0,0 +1,66 @@
+import jwt
+import time
+import uuid
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, Tuple, Union
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+
+
+@dataclass
+class _CachedToken:
+    p8_digest: bytes
+    private_key: ec.EllipticCurvePrivateKey
+    token: str = ""
+    expires_at: float = 0
+
+
+class TokenCache:
+    """
+    Signed App Store Connect tokens, keyed by (key_id, issuer_id).
+
+    The p8 key is parsed once per key and a token is reused until
+    ``refresh_margin`` seconds before it expires.
+    """
+    lifetime: int = 20 * 60  # apple rejects tokens valid for more than 20 minutes
+    refresh_margin: int = 60
+
+    _tokens: Dict[Tuple[str, str], _CachedToken] = {}
+
+    @classmethod
+    def get_token(cls, key_id: str, issuer_id: str, p8_file: Union[str, bytes]) -> str:
+        if isinstance(p8_file, str):
+            p8_file = p8_file.encode()
+
+        cache_key = (key_id, issuer_id)
+        p8_digest = hashlib.sha256(p8_file).digest()
+        entry = cls._tokens.get(cache_key)
+
+        # a re-imported account may come with a new p8 for the same key id
+        if entry is None or entry.p8_digest != p8_digest:
+            entry = _CachedToken(p8_digest=p8_digest, private_key=load_pem_private_key(p8_file, password=None))
+            cls._tokens[cache_key] = entry
+
+        now = time.time()
+        if entry.expires_at - cls.refresh_margin <= now:
+            entry.token, entry.expires_at = cls._sign(key_id, issuer_id, entry.private_key, now)
+        return entry.token
+
+    @classmethod
+    def invalidate(cls, key_id: str, issuer_id: str):
+        cls._tokens.pop((key_id, issuer_id), None)
+
+    @classmethod
+    def _sign(cls, key_id: str, issuer_id: str, private_key: ec.EllipticCurvePrivateKey, now: float) -> Tuple[str, int]:
+        issued_at = int(now)
+        expires_at = issued_at + cls.lifetime
+        headers = {"alg": "ES256", "kid": key_id, "typ": "JWT"}
+        payload = {
+            "iss": issuer_id,
+            "iat": issued_at,
+            "exp": expires_at,
+            "aud": "appstoreconnect-v1",
+            "jti": str(uuid.uuid4()),
+        }
+        return jwt.encode(payload, private_key, algorithm="ES256", headers=headers), expires_at
@@ -0,0 +1,83 @@
+"""
+Standalone account checker, for running the sweep outside the bot.
+
+    python -m api.worker
+    python -m api.worker --once
+
+Start as many as needed, on any host that reaches the same MongoDB and
+Redis; accounts are shared through Redis leases (see api.lease), so no
+account is checked by two workers at once and a dead worker's accounts are
+picked up by the others. Set CHECKER_IN_BOT = False to keep the bot itself
+out of the sweep.
+"""
+import signal
+import asyncio
+import logging
+import argparse
+import config
+from api.lease import LeaseManager
+from api.cache import ResponseCache
+from api.session import SessionPool
+from api.checker import AccountChecker
+from checker import warm_certificates
+from checker.ca_cache import CertificateCache
+from checker.ocsp_cache import OCSPCache
+from checker.session import close_session as close_checker_session
+from database import Database, RedisDatabase
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+
+async def run(args: argparse.Namespace):
+    rdb = RedisDatabase(config.REDIS_URL)
+    db = Database(config.DATABASE_URL, r2=config.KEYS_R2)
+
+    await db.setup()
+    await SessionPool.start()
+    OCSPCache.configure(rdb.db)
+    await warm_certificates()
+    if config.ASC_CACHE_ENABLED:
+        ResponseCache.configure(rdb.db, ttls=config.ASC_CACHE_TTLS)
+
+    leases = LeaseManager(rdb.db, ttl=config.CHECKER_LEASE_TTL)
+    account_checker = AccountChecker(db=db, concurrency=args.concurrency, leases=leases)
+    logging.info(f"Checker worker {leases.owner} started")
+
+    scheduler = AsyncIOScheduler()
+    try:
+        if args.once:
+            await account_checker.start_checking()
+            await account_checker.check_due()
+            return
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        scheduler.start()
+        account_checker.add_jobs(scheduler)
+        await stop.wait()
+    finally:
+        if scheduler.running:
+            scheduler.shutdown(wait=False)
+        await SessionPool.close()
+        await CertificateCache.stop_refresh()
+        await close_checker_session()
+        logging.info(f"Checker worker {leases.owner} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m api.worker", description="Run the account checker outside the bot.")
+    parser.add_argument("--once", action="store_true", help="run one sweep and one due-udid pass, then exit")
+    parser.add_argument("--concurrency", type=int, default=config.CHECKER_CONCURRENCY, help="accounts checked at once by this worker")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
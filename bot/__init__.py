@@ -2,6 +2,15 @@ import config
 import logging
 
 from api import AccountsManager
+from api.key import KeyPool
+from api.cache import ResponseCache
+from api.session import SessionPool
+from checker import warm_certificates
+from checker.ca_cache import CertificateCache
+from checker.ocsp_cache import OCSPCache
+from checker.profile_cache import ProfileCache
+from checker.session import close_session as close_checker_session
+from api.lease import LeaseManager
 from api.checker import AccountChecker
 
 from database import Database, RedisDatabase
@@ -26,15 +35,17 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 async def setup(app: Application):
     bot = app.bot
     await db.setup()
+    await SessionPool.start()
+    OCSPCache.configure(rdb.db)
+    ProfileCache.configure(config.PROFILE_CACHE_MAX_BYTES)
+    await warm_certificates()
+    if config.ASC_CACHE_ENABLED:
+        ResponseCache.configure(rdb.db, ttls=config.ASC_CACHE_TTLS)
+    await KeyPool.start()
 
     schedulers.start()
-    schedulers.add_job(
-        account_checker.start_checking,
-        trigger="cron",
-        hour="*",
-        id="account_checker",
-        max_instances=1,
-    )
+    if config.CHECKER_IN_BOT:
+        account_checker.add_jobs(schedulers)
 
     await bot.delete_my_commands()
     await bot.set_my_commands(
@@ -53,14 +64,24 @@ async def setup(app: Application):
         ], 
         scope=BotCommandScopeAllGroupChats()
     )
-    
+
+
+async def shutdown(app: Application):
+    if schedulers.running:
+        schedulers.shutdown(wait=False)
+    await SessionPool.close()
+    await CertificateCache.stop_refresh()
+    await close_checker_session()
+    await KeyPool.close()
+
+
 r2 = config.R2
 keys_r2 = config.KEYS_R2
     
 rdb = RedisDatabase(config.REDIS_URL)
 db = Database(config.DATABASE_URL, r2=keys_r2)
 translations = Translations(db=db)
-account_checker = AccountChecker(db=db)
+account_checker = AccountChecker(db=db, leases=LeaseManager(rdb.db, ttl=config.CHECKER_LEASE_TTL))
 AccountsManager.db = db
 
 schedulers = AsyncIOScheduler()
@@ -71,6 +92,7 @@ app = (
     .defaults(Defaults(parse_mode="HTML", block=False, link_preview_options=LinkPreviewOptions(is_disabled=True)))
     .persistence(PicklePersistence(filepath="data_file"))
     .post_init(setup)
+    .post_shutdown(shutdown)
     .write_timeout(60*60)
     .read_timeout(60*60)
     .build()
@@ -11,7 +11,7 @@ from bot.utils import sanitize, send_log
 from bot.states import ImportAccountStates
 from bot import translations, LanguagePack, db
 from telegram.ext import CallbackContext, ConversationHandler
-from api import AppleDeveloperAccount, errors, DeviceType, AccountsManager
+from api import AppleDeveloperAccount, errors, DeviceType, AccountsManager, DEVICE_FIELDS
 from telegram import Update, ReactionTypeEmoji, InputFile, InlineKeyboardButton, InlineKeyboardMarkup
 
 
@@ -77,7 +77,8 @@ async def p8_file_handler(user_lang: LanguagePack, update: Update, context: Call
     buffer.seek(0)
 
     try:
-        account_response = await account.get_account_info()
+        # always hit apple here, this call is what validates the uploaded credentials
+        account_response = await account.get_account_info(cached=False)
         account_data = account_response[0]
         account_id = account_data.get("id")
         username = account_data.get("attributes", {}).get("username")
@@ -86,8 +87,8 @@ async def p8_file_handler(user_lang: LanguagePack, update: Update, context: Call
 
         alert_message = await update.effective_message.reply_text(user_lang.IMPORTING_PROGRESS_MESSAGE.format(first_name=first_name, last_name=last_name))
 
-        ios_data = await account.get_devices_info(DeviceType.IOS)
-        macos_data = await account.get_devices_info(DeviceType.MAC_OS)
+        ios_data = await account.get_devices_info(DeviceType.IOS, fields=DEVICE_FIELDS)
+        macos_data = await account.get_devices_info(DeviceType.MAC_OS, fields=DEVICE_FIELDS)
         certificate_id, certificate, certificate_id_dev, certificate_dev = await account.generate_certificate(password=config.PASSWORD)
         logging.info(f"Certificate ID : {certificate_id}")
 
@@ -141,21 +142,21 @@ async def p8_file_handler(user_lang: LanguagePack, update: Update, context: Call
         "ios_count": len(ios_data),
         "macos_count": len(macos_data),
         "certificate_id": certificate_id,
-        "certificate_id_dev": certificate_id_dev
+        "certificate_id_dev": certificate_id_dev,
+        # recorded for the previous certificate, the checker fills it in again
+        "certificate_status": None,
     }
 
     all_devices = ios_data + macos_data
 
     importing_device_message = await update.effective_message.reply_text(user_lang.IMPORTING_DEVICES_MESSAGE.format(completed=0, total=len(all_devices)))
 
-    for no, device in enumerate(ios_data + macos_data, start=1):
+    enabled_devices = []
+    for device in all_devices:
         device_attributes = device.get("attributes", {})
 
         logging.info(f"Importing device {device.get('id')} with deviceClass {device_attributes.get('deviceClass')}")
 
-        if no % 10 == 0:
-            await importing_device_message.edit_text(user_lang.IMPORTING_DEVICES_MESSAGE.format(completed=no, total=len(all_devices)))
-
         if device_attributes.get("deviceClass") not in ["IPHONE", "IPOD", "MAC", "IPAD"]:
             logging.info(f"Skipping device {device.get('id')} because it is not allowed deviceClass")
             continue
@@ -168,12 +169,27 @@ async def p8_file_handler(user_lang: LanguagePack, update: Update, context: Call
             #     # logging.info(register_response)
             #     device = await account.get_udid_info(udid_id=device.get("id"))
 
-            logging.info(f"Creating provision for device {device.get('id')} with deviceClass {device_attributes.get('deviceClass')}")
-            device["provision_data"] = await account.create_provision(certificate_id=certificate_id, device_id=device.get("id"), app_id=app_id)
-            device["provision_data_dev"] = await account.create_provision(certificate_id=certificate_id_dev, device_id=device.get("id"), app_id=app_id, adhoc=False)
+            enabled_devices.append(device)
         device["user_id"] = update.effective_user.id
         device["account_id"] = account_id
 
+    async def provision_progress(completed: int, total: int):
+        await importing_device_message.edit_text(user_lang.IMPORTING_DEVICES_MESSAGE.format(completed=completed, total=total))
+
+    logging.info(f"Creating provisions for {len(enabled_devices)} enabled devices")
+    provisions = await account.create_provision_pairs(
+        certificate_id=certificate_id,
+        certificate_id_dev=certificate_id_dev,
+        device_ids=[device.get("id") for device in enabled_devices],
+        app_id=app_id,
+        callback=provision_progress,
+    )
+    for device in enabled_devices:
+        result = provisions.get(device.get("id"))
+        # failures are logged by create_provision_pairs, those devices can be refetched later
+        if isinstance(result, tuple):
+            device["provision_data"], device["provision_data_dev"] = result
+
     await importing_device_message.edit_text(user_lang.IMPORTED_DEVICES_MESSAGE.format(completed=len(all_devices), total=len(all_devices)))
 
     await db.udids.delete_many({"account_id": account_id})
@@ -246,30 +262,34 @@ async def cnfrefresh_account(user_lang: LanguagePack, update: Update, context: C
     active_udids = db.udids.find(filters)
     total_active_udid_count = await db.udids.count_documents(filters)
 
-    apple_account = AppleDeveloperAccount(key_id=account_data["key_id"], issuer_id=account_data["issue_id"], p8_file=base64.b64decode(account_data["p8_file"]))
+    apple_account = AppleDeveloperAccount.from_account(account_data)
 
-    count = 0
-    await update.effective_message.edit_text(user_lang.REFETCHING_PROVISION_MESSAGE.format(completed=count, total=total_active_udid_count))
-    async for udid in active_udids:
-        count += 1
+    await update.effective_message.edit_text(user_lang.REFETCHING_PROVISION_MESSAGE.format(completed=0, total=total_active_udid_count))
 
+    async def refetch_progress(completed: int, total: int):
         try:
-            new_udid_provision_data = await apple_account.create_provision(certificate_id=account_data.get('certificate_id'), device_id=udid.get("id"), app_id=account_data.get("app_id"))
-            new_udid_provision_data_dev = await apple_account.create_provision(certificate_id=account_data.get('certificate_id_dev'), device_id=udid.get("id"), app_id=account_data.get("app_id"), adhoc=False)
-            await db.udids.update_one(
-                {"_id": udid["_id"]},
-                {"$set": {
-                    "provision_data": new_udid_provision_data,
-                    "provision_data_dev": new_udid_provision_data_dev
-                }}
-            )
-        except Exception as e:
-            logging.exception(f"Error refreshing provision for udid {udid.get('id')}: {e}")
+            await update.effective_message.edit_text(user_lang.REFETCHING_PROVISION_MESSAGE.format(completed=completed, total=total))
+        except: pass
+
+    udid_documents = {udid.get("id"): udid async for udid in active_udids}
+    provisions = await apple_account.create_provision_pairs(
+        certificate_id=account_data.get('certificate_id'),
+        certificate_id_dev=account_data.get('certificate_id_dev'),
+        device_ids=list(udid_documents),
+        app_id=account_data.get("app_id"),
+        callback=refetch_progress,
+    )
+
+    for device_id, result in provisions.items():
+        if not isinstance(result, tuple):
+            continue
 
-        if count % 10 == 0:
-            try:
-                await update.effective_message.edit_text(user_lang.REFETCHING_PROVISION_MESSAGE.format(completed=count, total=total_active_udid_count))
-            except: pass
+        new_udid_provision_data, new_udid_provision_data_dev = result
+        new_data = {"provision_data": new_udid_provision_data}
+        # keep the previous development profile if only that one failed
+        if new_udid_provision_data_dev:
+            new_data["provision_data_dev"] = new_udid_provision_data_dev
+        await db.udids.update_one({"_id": udid_documents[device_id]["_id"]}, {"$set": new_data})
 
     await update.effective_message.edit_text(user_lang.REFETCH_COMPLETED_MESSAGE.format(total_udids=total_active_udid_count))
 
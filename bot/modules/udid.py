@@ -8,7 +8,7 @@ import config
 import logging
 import asyncio
 from html import escape
-from checker import check
+from checker import check, check_many
 from bson import ObjectId
 from bson.errors import InvalidId
 from template import PLIST_TEMPLATE
@@ -17,6 +17,7 @@ from datetime import datetime, timedelta, timezone
 from bot import translations, LanguagePack, db, r2, rdb
 from telegram.ext import CallbackContext, ConversationHandler
 from api import AppleDeveloperAccount, errors, DeviceType, AccountsManager
+from api.checker import stored_certificate_status
 from bot.states import RegisterUDIDStates, CheckUDIDStates, GenerateKeyStates, EnableDisableUDID
 from bot.utils import sanitize, send_log, aenumerate, normalize_time, get_command, url_shortner, format_time
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaDocument, InputFile, ReactionTypeEmoji
@@ -56,7 +57,7 @@ async def headless_udid_check(user_lang: LanguagePack, update: Update, context:
         provision_data = device.get("provision_data")
 
         if provision_data:
-            check_response = await check(base64.b64decode(provision_data.get("profileContent")))
+            check_response = await check(profile_content=provision_data.get("profileContent"), known_status=stored_certificate_status(account_data))
             status = check_response.get("certificate_status")
             entitlements = "\n".join([f"{'✅' if value.get('status') else '❌'} {key}" for key, value in check_response.get('entitlements').items()])
             check_response.update(entitlements=entitlements)
@@ -126,6 +127,8 @@ async def check_udid_handler(user_lang: LanguagePack, update: Update, context: C
 
     await update.effective_message.set_reaction(ReactionTypeEmoji("⚡️"))
 
+    found = []
+    found_ids = set()
     for udid in udids[:config.MULTI_UDID_LIMIT]:
         if len(udid) not in {25, 40, 60}:
             await update.effective_message.reply_text(user_lang.INVALID_UDID_ERROR.format(udid=udid))
@@ -137,69 +140,91 @@ async def check_udid_handler(user_lang: LanguagePack, update: Update, context: C
             await update.effective_message.reply_text(user_lang.UDID_NOT_FOUND_ERROR)
             continue
 
-        async for no, device in aenumerate(devices, start=1):
-            status = device.get('attributes', {}).get("status")
+        async for device in devices:
             account_data = await db.accounts.find_one({"account_info.id": device.get('account_id')})
             if not account_data:
                 logging.info(f"Account not found for UDID: {udid}")
                 continue
+            # the same udid pasted twice is shown once
+            if device["_id"] in found_ids:
+                continue
+            found_ids.add(device["_id"])
+            found.append((udid, device, account_data))
+
+    # devices on the same account share a certificate, so check them all in one go
+    checked = [(udid, device, account_data) for udid, device, account_data in found if device.get("provision_data")]
+    check_responses = await check_many(
+        [device["provision_data"].get("profileContent") for _, device, _ in checked],
+        known_statuses=[stored_certificate_status(account_data) for _, _, account_data in checked],
+    )
+    check_responses = {device['_id']: check_response for (_, device, _), check_response in zip(checked, check_responses)}
 
-            post_second_button = True
-            is_owner = account_data.get("user_id") == update.effective_user.id
-            is_reseller = any(reseller.get("user_id") == update.effective_user.id for reseller in account_data.get("resellers", []))
+    for udid, device, account_data in found:
+        status = device.get('attributes', {}).get("status")
 
-            first_name = account_data.get("account_info", {}).get("attributes", {}).get("firstName")
-            last_name = account_data.get("account_info", {}).get("attributes", {}).get("lastName")
-            provision_data = device.get("provision_data")
+        post_second_button = True
+        is_owner = account_data.get("user_id") == update.effective_user.id
+        is_reseller = any(reseller.get("user_id") == update.effective_user.id for reseller in account_data.get("resellers", []))
 
-            if provision_data:
-                check_response = await check(base64.b64decode(provision_data.get("profileContent")))
-                status = check_response.get("certificate_status")
-                entitlements = "\n".join([f"{'✅' if value.get('status') else '❌'} {key}" for key, value in check_response.get('entitlements').items()])
-                check_response.update(entitlements=entitlements)
-                device.update(**check_response)
+        first_name = account_data.get("account_info", {}).get("attributes", {}).get("firstName")
+        last_name = account_data.get("account_info", {}).get("attributes", {}).get("lastName")
+        provision_data = device.get("provision_data")
 
-            TEMPLATE = user_lang.NORMAL_PROVISION_TEMPLATE
-            buttons = []
-            match status:
-                case "ENABLED":
-                    status_string = "Active 🟢"
-                    if device.get("provision_data"):
-                        TEMPLATE = user_lang.ENABLED_PROVISION_TEMPLATE
-                        buttons.append([InlineKeyboardButton(user_lang.GET_CERTIFICATE_BUTTON.format(first_name=first_name, last_name=last_name), callback_data=f"get_cert|{device.get('id')}|{account_data.get('_id')}")])
-                case "PROCESSING":
-                    enables_in = datetime.fromisoformat(device.get("attributes", {}).get("addedDate")) + timedelta(days=3, hours=12) - datetime.now(timezone.utc)
-                    enables_in_seconds = enables_in.total_seconds()
-                    days, hours, minutes, _ = normalize_time(enables_in_seconds)
-                    status_string = user_lang.PROCESSING_STATE.format(days=days, hours=hours, minutes=minutes)
-                case "REVOKED":
-                    post_second_button = False
-                    status_string = user_lang.REVOKED_STATE
-                case "EXPIRED":
-                    post_second_button = False
-                    status_string = user_lang.EXPIRED_STATE
-                case "DISABLED":
-                    status_string = user_lang.DISABLED_STATE
-                case "INELIGIBLE":
-                    status_string = user_lang.INELIGIBLE_STATE
-                case unknown:
-                    status_string = unknown
+        if provision_data:
+            check_response = check_responses[device['_id']]
+            if isinstance(check_response, Exception):
+                # one broken profile shouldn't hide the other devices
+                logging.error(f"Could not read the profile of udid {device.get('id')}: {check_response!r}")
+                await update.effective_message.reply_text(user_lang.PROFILE_READ_ERROR.format(udid=udid))
+                continue
+            # a copy, the entitlements are replaced by their rendered text below
+            check_response = dict(check_response)
+            status = check_response.get("certificate_status")
+            entitlements = "\n".join([f"{'✅' if value.get('status') else '❌'} {key}" for key, value in check_response.get('entitlements').items()])
+            check_response.update(entitlements=entitlements)
+            device.update(**check_response)
 
-            if is_owner or is_reseller and post_second_button:
-                is_udid_disabled = device.get("disabled") == True
-                action = "hlenable" if is_udid_disabled else "hldisable"
-                buttons.append(
-                    [
-                        InlineKeyboardButton(user_lang.ENABLE_UDID if is_udid_disabled else user_lang.DISABLE_UDID, callback_data=f"{action}|{device.get('_id')}"),
-                        InlineKeyboardButton(user_lang.SHARE_LINK_BUTTON, url=f"tg://msg_url?url=t.me/{context.bot.username}?start=chk{udid}"),
-                    ]
-                )
-            device['attributes']['addedDate'] = format_time(device.get("attributes", {}).get("addedDate"))
+        TEMPLATE = user_lang.NORMAL_PROVISION_TEMPLATE
+        buttons = []
+        match status:
+            case "ENABLED":
+                status_string = "Active 🟢"
+                if device.get("provision_data"):
+                    TEMPLATE = user_lang.ENABLED_PROVISION_TEMPLATE
+                    buttons.append([InlineKeyboardButton(user_lang.GET_CERTIFICATE_BUTTON.format(first_name=first_name, last_name=last_name), callback_data=f"get_cert|{device.get('id')}|{account_data.get('_id')}")])
+            case "PROCESSING":
+                enables_in = datetime.fromisoformat(device.get("attributes", {}).get("addedDate")) + timedelta(days=3, hours=12) - datetime.now(timezone.utc)
+                enables_in_seconds = enables_in.total_seconds()
+                days, hours, minutes, _ = normalize_time(enables_in_seconds)
+                status_string = user_lang.PROCESSING_STATE.format(days=days, hours=hours, minutes=minutes)
+            case "REVOKED":
+                post_second_button = False
+                status_string = user_lang.REVOKED_STATE
+            case "EXPIRED":
+                post_second_button = False
+                status_string = user_lang.EXPIRED_STATE
+            case "DISABLED":
+                status_string = user_lang.DISABLED_STATE
+            case "INELIGIBLE":
+                status_string = user_lang.INELIGIBLE_STATE
+            case unknown:
+                status_string = unknown
+
+        if is_owner or is_reseller and post_second_button:
+            is_udid_disabled = device.get("disabled") == True
+            action = "hlenable" if is_udid_disabled else "hldisable"
+            buttons.append(
+                [
+                    InlineKeyboardButton(user_lang.ENABLE_UDID if is_udid_disabled else user_lang.DISABLE_UDID, callback_data=f"{action}|{device.get('_id')}"),
+                    InlineKeyboardButton(user_lang.SHARE_LINK_BUTTON, url=f"tg://msg_url?url=t.me/{context.bot.username}?start=chk{udid}"),
+                ]
+            )
+        device['attributes']['addedDate'] = format_time(device.get("attributes", {}).get("addedDate"))
 
-            device.update(status_string=status_string, udid=udid, first_name=first_name, last_name=last_name)
-            status_message = TEMPLATE.format_map(device)
+        device.update(status_string=status_string, udid=udid, first_name=first_name, last_name=last_name)
+        status_message = TEMPLATE.format_map(device)
 
-            await update.effective_message.reply_text(status_message, reply_markup=InlineKeyboardMarkup(buttons))
+        await update.effective_message.reply_text(status_message, reply_markup=InlineKeyboardMarkup(buttons))
 
     return ConversationHandler.END
 
@@ -338,7 +363,7 @@ async def register_udid(user_lang: LanguagePack, update: Update, context: Callba
 
         alert_message = await update.effective_message.reply_text(user_lang.PROCESSING_REGISTER_UDID)
         try:
-            apple_account = AppleDeveloperAccount(key_id=account_data["key_id"], issuer_id=account_data["issue_id"], p8_file=base64.b64decode(account_data["p8_file"]))
+            apple_account = AppleDeveloperAccount.from_account(account_data)
             device_type = DeviceType.IOS if context.user_data["device_type"] == "ios" else DeviceType.MAC_OS
 
             register_response = await apple_account.register_udid(udid=udid, device_type=device_type)
@@ -360,9 +385,13 @@ async def register_udid(user_lang: LanguagePack, update: Update, context: Callba
                 case "ENABLED":
                     await alert_message.edit_text(user_lang.CHECKING_UDID_STATUS)
                     TEMPLATE = user_lang.ENABLED_PROVISION_TEMPLATE
-                    provision_data = await apple_account.create_provision(certificate_id=account_data.get('certificate_id'), device_id=response_data.get("id"), app_id=account_data.get("app_id"))
-                    provision_data_dev = await apple_account.create_provision(certificate_id=account_data.get('certificate_id_dev'), device_id=response_data.get("id"), app_id=account_data.get("app_id"), adhoc=False)
-                    check_response = await check(base64.b64decode(provision_data.get("profileContent")))
+                    provision_data, provision_data_dev = await apple_account.create_provision_pair(
+                        certificate_id=account_data.get('certificate_id'),
+                        certificate_id_dev=account_data.get('certificate_id_dev'),
+                        device_id=response_data.get("id"),
+                        app_id=account_data.get("app_id"),
+                    )
+                    check_response = await check(profile_content=provision_data.get("profileContent"))
                     status = check_response.get("certificate_status")
                     entitlements = "\n".join([f"{'✅' if value.get('status') else '❌'} {key}" for key, value in check_response.get('entitlements').items()])
                     check_response.update(entitlements=entitlements)
@@ -1,20 +1,67 @@
-import aiohttp
+import asyncio
+from typing import Iterable, List, Mapping, Optional, Union
 from cryptography import x509
-from async_lru import alru_cache
 from checker.ocsp_utils import _ocsp_check
+from checker.session import get_session
+from checker.ca_cache import CertificateCache
+from checker.profile_cache import ProfileCache
+from checker.issuers import IssuerStore, WWDR_CERTIFICATES
 from checker.entitlement_utils import check_entitlements
 from checker.certificate_utils import extract_cert_from_mobileprovision, extract_cert_from_p12, get_certificate_info
 
 
-@alru_cache(ttl=60 * 60) # Cache for 1 hour
-async def fetch_certificate(session, url):
-    async with session.get(url) as response:
-        return await response.read()
+async def fetch_certificate(url: str) -> x509.Certificate:
+    return await CertificateCache.get(url)
 
 
-async def check(mobileprovision_bytes: bytes = None, p12_bytes: bytes = None, password: str = ""):
+async def warm_certificates():
+    # load the intermediates from disk (or apple) before the first check needs them
+    await IssuerStore.load()
+    CertificateCache.start_refresh()
+
+
+async def certificate_status(p12_cert: x509.Certificate, cert_info: Mapping) -> str:
+    ocsp_status = "Unknown"
+    session = get_session()
+
+    issuer = await IssuerStore.issuer_for(p12_cert)
+    if issuer is not None:
+        try:
+            ocsp_status = await _ocsp_check(session, p12_cert, issuer, cert_info["ocsp_url"])
+        except Exception as e:
+            ocsp_status = f"OCSP check failed: {str(e)}"
+    else:
+        # unknown authority key identifier, fall back to trying every intermediate
+        for url in WWDR_CERTIFICATES.values():
+            try:
+                ca_cert = await fetch_certificate(url)
+                ocsp_status = await _ocsp_check(session, p12_cert, ca_cert, cert_info["ocsp_url"])
+
+                if ocsp_status in ["ENABLED", "REVOKED"]:
+                    break
+            except Exception as e:
+                ocsp_status = f"OCSP check failed: {str(e)}"
+
+    return ocsp_status
+
+
+def known_certificate_status(known_status: Optional[dict], cert_info: Mapping) -> Optional[str]:
+    """``known_status["status"]`` if it was recorded for this certificate, see api.checker.stored_certificate_status."""
+    if known_status and known_status.get("fingerprint") == cert_info["fingerprint_sha256"]:
+        return known_status.get("status")
+    return None
+
+
+async def check(mobileprovision_bytes: bytes = None, p12_bytes: bytes = None, password: str = "", profile_content: str = None, known_status: Optional[dict] = None):
     try:
-        if mobileprovision_bytes:
+        if profile_content:
+            # base64 profileContent as stored by apple, parsed once and cached
+            profile = ProfileCache.get(profile_content)
+            p12_cert = profile.certificate
+            # shared with the cache, fields computed once are kept for the next check
+            cert_info = profile.certificate_info
+            entitlements_info = dict(profile.entitlements)
+        elif mobileprovision_bytes:
             p12_cert, entitlements = extract_cert_from_mobileprovision(mobileprovision_bytes)
             cert_info = get_certificate_info(p12_cert)
             entitlements_info = check_entitlements(entitlements)
@@ -23,29 +70,12 @@ async def check(mobileprovision_bytes: bytes = None, p12_bytes: bytes = None, pa
             cert_info = get_certificate_info(p12_cert)
             entitlements_info = "Not applicable for p12 files"
         else:
-            raise ValueError("Either mobileprovision_path or p12_path must be provided.")
+            raise ValueError("Either profile_content, mobileprovision_path or p12_path must be provided.")
     except Exception as e:
         raise e 
 
-    ca_certs = ["AppleWWDRCA", "AppleWWDRCAG2", "AppleWWDRCAG3", "AppleWWDRCAG4", "AppleWWDRCAG5", "AppleWWDRCAG6"]
-    ocsp_status = "Unknown"
-
-    async with aiohttp.ClientSession() as session:
-        for cert in ca_certs:
-            try:
-                url = (
-                    "https://developer.apple.com/certificationauthority/AppleWWDRCA.cer"
-                    if cert.endswith("A")
-                    else f"https://www.apple.com/certificateauthority/{cert}.cer"
-                )
-                ca_cert_data = await fetch_certificate(session, url)
-                ca_cert = x509.load_der_x509_certificate(ca_cert_data)
-                ocsp_status = _ocsp_check(p12_cert, ca_cert, cert_info["ocsp_url"])
-
-                if ocsp_status in ["ENABLED", "REVOKED"]:
-                    break
-            except Exception as e:
-                ocsp_status = f"OCSP check failed: {str(e)}"
+    # a status the background checker already recorded for this certificate saves the OCSP round trip
+    ocsp_status = known_certificate_status(known_status, cert_info) or await certificate_status(p12_cert, cert_info)
 
     result = {
         "certificate_info": cert_info,
@@ -54,3 +84,49 @@ async def check(mobileprovision_bytes: bytes = None, p12_bytes: bytes = None, pa
     }
 
     return result
+
+
+async def check_many(profiles: Iterable[str], known_statuses: Iterable[Optional[dict]] = ()) -> List[Union[dict, Exception]]:
+    """
+    Check several base64 profileContent values at once.
+
+    Profiles signed with the same certificate share a single OCSP lookup,
+    and profiles with a known status (matched by position in
+    ``known_statuses``, and only if it was recorded for their certificate)
+    skip it. Results come back in the order of
+    ``profiles``; a profile that can't be parsed gets its exception in
+    place of the result.
+    """
+    parsed = []
+    for profile_content in profiles:
+        try:
+            parsed.append(ProfileCache.get(profile_content))
+        except Exception as e:
+            parsed.append(e)
+
+    known = {}
+    for profile, known_status in zip(parsed, known_statuses):
+        if isinstance(profile, Exception):
+            continue
+        if status := known_certificate_status(known_status, profile.certificate_info):
+            known[profile.certificate_info["fingerprint_sha256"]] = status
+
+    distinct = {}
+    for profile in parsed:
+        if not isinstance(profile, Exception) and profile.certificate_info["fingerprint_sha256"] not in known:
+            distinct.setdefault(profile.certificate_info["fingerprint_sha256"], profile)
+
+    statuses = await asyncio.gather(*(certificate_status(profile.certificate, profile.certificate_info) for profile in distinct.values()))
+    statuses = {**dict(zip(distinct, statuses)), **known}
+
+    results = []
+    for profile in parsed:
+        if isinstance(profile, Exception):
+            results.append(profile)
+            continue
+        results.append({
+            "certificate_info": profile.certificate_info,
+            "certificate_status": statuses[profile.certificate_info["fingerprint_sha256"]],
+            "entitlements": dict(profile.entitlements),
+        })
+    return results
@@ -0,0 +1,164 @@
+"""
+Check stored profiles and certificates without going through the bot.
+
+    python -m checker profiles/ backups/**/*.mobileprovision
+    python -m checker certs/*.p12 --password 1234 --output results.jsonl
+
+Files are parsed in chunks in a process pool. Every distinct certificate
+gets one OCSP lookup, started as soon as a parsed chunk first shows it.
+One JSON line is written per file as soon as its certificate's status is
+known, or right away for files that can't be read.
+"""
+import os
+import sys
+import glob
+import json
+import asyncio
+import logging
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+from cryptography import x509
+from cryptography.hazmat.primitives import serialization
+from checker import certificate_status
+from checker.issuers import IssuerStore
+from checker.session import close_session
+from checker.entitlement_utils import check_entitlements
+from checker.certificate_utils import CertificateInfo, get_certificate_info, parse_mobileprovision, extract_cert_from_plist, extract_cert_from_p12
+
+EXTENSIONS = (".mobileprovision", ".p12")
+DEFAULT_FIELDS = "subject,serial_number,valid_from,valid_to,fingerprint_sha256"
+
+
+def expand_paths(patterns: List[str]) -> Iterator[str]:
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths = (os.path.join(root, name) for root, _, names in os.walk(pattern) for name in names)
+        else:
+            paths = glob.iglob(pattern, recursive=True)
+
+        for path in paths:
+            if path.endswith(EXTENSIONS) and os.path.isfile(path) and path not in seen:
+                seen.add(path)
+                yield path
+
+
+def parse_file(path: str, password: str, fields: List[str]) -> dict:
+    # runs in a worker process, so everything returned has to pickle
+    result = {"path": path}
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+
+        if path.endswith(".p12"):
+            cert = extract_cert_from_p12(data, password)
+        else:
+            plist = parse_mobileprovision(data)
+            cert, entitlements = extract_cert_from_plist(plist)
+            result["entitlements"] = list(check_entitlements(entitlements))
+            expiration_date = plist.get("ExpirationDate")
+            if isinstance(expiration_date, datetime):
+                result["expiration_date"] = expiration_date.isoformat()
+
+        cert_info = get_certificate_info(cert)
+        result["certificate_info"] = {field: cert_info[field] for field in fields}
+        result["fingerprint"] = cert_info["fingerprint_sha256"]
+        result["certificate"] = cert.public_bytes(serialization.Encoding.DER)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def parse_files(paths: List[str], password: str, fields: List[str]) -> List[dict]:
+    return [parse_file(path, password, fields) for path in paths]
+
+
+async def run(args: argparse.Namespace, output):
+    fields = [field.strip() for field in args.fields.split(",") if field.strip()]
+    paths = list(expand_paths(args.paths))
+    logging.info(f"Checking {len(paths)} files")
+
+    def write(result: dict):
+        result.pop("fingerprint", None)
+        output.write(json.dumps(result, default=str) + "\n")
+
+    await IssuerStore.load()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    statuses: Dict[str, str] = {}
+    # parsed files waiting for the status of their certificate
+    waiting: Dict[str, List[dict]] = {}
+    checks = []
+
+    async def check_certificate(fingerprint: str, certificate: bytes):
+        cert = x509.load_der_x509_certificate(certificate)
+        async with semaphore:
+            status = await certificate_status(cert, get_certificate_info(cert))
+        statuses[fingerprint] = status
+        for result in waiting.pop(fingerprint):
+            result["certificate_status"] = status
+            write(result)
+        output.flush()
+
+    def add(result: dict):
+        if "error" in result:
+            write(result)
+            return
+        # only the first file of each certificate keeps it, long enough to start its check
+        certificate = result.pop("certificate")
+        fingerprint = result["fingerprint"]
+        if fingerprint in statuses:
+            result["certificate_status"] = statuses[fingerprint]
+            write(result)
+        elif fingerprint in waiting:
+            waiting[fingerprint].append(result)
+        else:
+            waiting[fingerprint] = [result]
+            checks.append(asyncio.create_task(check_certificate(fingerprint, certificate)))
+
+    loop = asyncio.get_running_loop()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            chunksize = max(1, min(256, len(paths) // ((args.workers or os.cpu_count() or 1) * 4)))
+            chunks = [
+                loop.run_in_executor(executor, parse_files, paths[start:start + chunksize], args.password, fields)
+                for start in range(0, len(paths), chunksize)
+            ]
+            # certificates are checked while the remaining chunks are still being parsed
+            for chunk in asyncio.as_completed(chunks):
+                for result in await chunk:
+                    add(result)
+                output.flush()
+        await asyncio.gather(*checks)
+        logging.info(f"Checked {len(statuses)} distinct certificates")
+    finally:
+        for task in checks:
+            task.cancel()
+        await close_session()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m checker", description="Check .mobileprovision and .p12 files and write one JSON line per file.")
+    parser.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    parser.add_argument("--password", default="", help="password of the .p12 files")
+    parser.add_argument("--fields", default=DEFAULT_FIELDS, help="comma separated certificate info fields to include")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes, defaults to the number of cores")
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent OCSP lookups")
+    parser.add_argument("--output", help="write to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    unknown = set(field.strip() for field in args.fields.split(",") if field.strip()) - set(CertificateInfo.FIELDS)
+    if unknown:
+        parser.error(f"unknown fields: {', '.join(sorted(unknown))}")
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as output:
+            asyncio.run(run(args, output))
+    else:
+        asyncio.run(run(args, sys.stdout))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Iterable, Optional, Set
+from urllib.parse import urlparse
+from cryptography import x509
+from checker.session import get_session
+
+
+class CertificateCache:
+    """
+    Parsed CA certificates keyed by download URL.
+
+    Certificates are kept in memory, persisted to ``directory`` so restarts
+    don't re-download them, and refreshed from their URLs every
+    ``refresh_interval`` seconds by a background task. ``version`` changes
+    whenever the cached set does.
+    """
+    directory: str = os.path.join(os.path.dirname(__file__), "wwdr")
+    refresh_interval: int = 24 * 60 * 60
+
+    version: int = 0
+
+    _certificates: Dict[str, x509.Certificate] = {}
+    _pending: Dict[str, asyncio.Future] = {}
+    _refresh_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def _path(cls, url: str) -> str:
+        return os.path.join(cls.directory, os.path.basename(urlparse(url).path))
+
+    @classmethod
+    def _store(cls, url: str, cert: x509.Certificate):
+        if cls._certificates.get(url) != cert:
+            cls._certificates[url] = cert
+            cls.version += 1
+
+    @classmethod
+    def _read_disk(cls, url: str) -> Optional[x509.Certificate]:
+        path = cls._path(url)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, "rb") as file:
+                return x509.load_der_x509_certificate(file.read())
+        except ValueError:
+            logging.exception(f"Stored certificate {path} is not valid, downloading it again")
+            return None
+
+    @classmethod
+    async def _download(cls, url: str) -> x509.Certificate:
+        async with get_session().get(url) as response:
+            response.raise_for_status()
+            data = await response.read()
+        cert = x509.load_der_x509_certificate(data)
+
+        os.makedirs(cls.directory, exist_ok=True)
+        with open(cls._path(url), "wb") as file:
+            file.write(data)
+        return cert
+
+    @classmethod
+    async def get(cls, url: str) -> x509.Certificate:
+        cert = cls._certificates.get(url)
+        if cert is not None:
+            return cert
+
+        cert = cls._read_disk(url)
+        if cert is not None:
+            cls._store(url, cert)
+            return cert
+
+        # concurrent misses for the same url share one download
+        if url not in cls._pending:
+            cls._pending[url] = asyncio.ensure_future(cls._download(url))
+        try:
+            cert = await asyncio.shield(cls._pending[url])
+        finally:
+            if url in cls._pending and cls._pending[url].done():
+                cls._pending.pop(url, None)
+        cls._store(url, cert)
+        return cert
+
+    @classmethod
+    async def warm(cls, urls: Iterable[str]) -> Dict[str, x509.Certificate]:
+        urls = list(urls)
+        results = await asyncio.gather(*(cls.get(url) for url in urls), return_exceptions=True)
+        for url, result in zip(urls, results):
+            if isinstance(result, BaseException):
+                logging.error(f"Failed to load CA certificate {url}: {result}")
+        return cls.cached()
+
+    @classmethod
+    def cached(cls) -> Dict[str, x509.Certificate]:
+        return dict(cls._certificates)
+
+    @classmethod
+    async def refresh(cls, urls: Optional[Iterable[str]] = None):
+        failed: Set[str] = set()
+        for url in list(urls or cls._certificates):
+            try:
+                cls._store(url, await cls._download(url))
+            except Exception:
+                failed.add(url)
+                logging.exception(f"Failed to refresh CA certificate {url}, keeping the cached copy")
+        logging.info(f"Refreshed {len(cls._certificates) - len(failed)}/{len(cls._certificates)} CA certificates")
+
+    @classmethod
+    def start_refresh(cls):
+        async def refresh_loop():
+            while True:
+                await asyncio.sleep(cls.refresh_interval)
+                await cls.refresh()
+
+        if cls._refresh_task is None or cls._refresh_task.done():
+            cls._refresh_task = asyncio.create_task(refresh_loop())
+
+    @classmethod
+    async def stop_refresh(cls):
+        if cls._refresh_task is not None:
+            cls._refresh_task.cancel()
+            cls._refresh_task = None
@@ -1,23 +1,40 @@
-import plistlib
 import re
+import logging
+import plistlib
 from cryptography import x509
 from cryptography.hazmat.primitives import serialization, hashes
 from cryptography.hazmat.primitives.serialization import pkcs12
 import contextlib
+from collections.abc import Mapping
+from checker.cms import parse_signed_data
 
 
-def extract_cert_from_mobileprovision(mobileprovision: bytes):
+def parse_mobileprovision(mobileprovision: bytes) -> dict:
+    try:
+        content = parse_signed_data(mobileprovision).content
+        if content is not None:
+            return plistlib.loads(content)
+    except ValueError:
+        logging.warning("Failed to read the .mobileprovision envelope, scanning for the plist instead")
+
     plist_match = re.search(rb'<\?xml.*?\</plist\>', mobileprovision, re.DOTALL) or re.search(rb'bplist00.*', mobileprovision, re.DOTALL)
     if not plist_match:
         raise ValueError("Plist data not found in the .mobileprovision file.")
 
     plist_data = plist_match.group()
-    plist = plistlib.loads(plist_data)
+    return plistlib.loads(plist_data)
+
+
+def extract_cert_from_plist(plist: dict):
     cert_data = plist['DeveloperCertificates'][0]
     cert = x509.load_der_x509_certificate(cert_data)
     return cert, {k: v for k, v in plist.get('Entitlements', {}).items() if v}
 
 
+def extract_cert_from_mobileprovision(mobileprovision: bytes):
+    return extract_cert_from_plist(parse_mobileprovision(mobileprovision))
+
+
 def extract_cert_from_p12(p12_data: bytes, password: str = ""):
 
     p12 = pkcs12.load_key_and_certificates(p12_data, password.encode() or None)
@@ -26,36 +43,79 @@ def extract_cert_from_p12(p12_data: bytes, password: str = ""):
     return p12[1]
 
 
-def get_certificate_info(cert: x509.Certificate) -> dict:
-    def process_name(name):
-        value = name.value
-        return {"original": value, "truncated": value[:61] + "..."} if len(value) > 64 else value
-
-    subject_details = {name.oid._name: process_name(name) for name in cert.subject}
-    issuer_details = {name.oid._name: process_name(name) for name in cert.issuer}
-    extensions = {ext.oid._name or "Unknown OID": str(ext.value) for ext in cert.extensions}
-
-    return {
-        "subject": ",".join([f"{key}={value['truncated'] if isinstance(value, dict) else value}" for key, value in subject_details.items()]),
-        "issuer": ",".join([f"{key}={value['truncated'] if isinstance(value, dict) else value}" for key, value in issuer_details.items()]),
-        "serial_number": cert.serial_number,
-        "signature_algorithm": cert.signature_algorithm_oid._name,
-        "valid_from": cert.not_valid_before_utc.strftime("%d/%m/%Y"),
-        "valid_to": cert.not_valid_after_utc.strftime("%d/%m/%Y"),
-        "public_key_size": cert.public_key().key_size,
-        "fingerprint_sha256": cert.fingerprint(hashes.SHA256()).hex(),
-        "ocsp_url": _get_ocsp_url(cert),
-        "subject_details": subject_details,
-        "issuer_details": issuer_details,
-        "public_key_algorithm": cert.public_bytes(
+def _process_name(name):
+    value = name.value
+    return {"original": value, "truncated": value[:61] + "..."} if len(value) > 64 else value
+
+
+def _name_details(name: x509.Name) -> dict:
+    return {attribute.oid._name: _process_name(attribute) for attribute in name}
+
+
+def _format_name(details: dict) -> str:
+    return ",".join([f"{key}={value['truncated'] if isinstance(value, dict) else value}" for key, value in details.items()])
+
+
+class CertificateInfo(Mapping):
+    """
+    Read-only view of a certificate's details.
+
+    Behaves like the dict get_certificate_info used to return, but each field
+    is computed on first access, so the templates only pay for what they
+    show. ``to_dict`` builds the full dict.
+    """
+    __slots__ = ("certificate", "_values")
+
+    FIELDS = {
+        "subject": lambda info: _format_name(info["subject_details"]),
+        "issuer": lambda info: _format_name(info["issuer_details"]),
+        "serial_number": lambda info: info.certificate.serial_number,
+        "signature_algorithm": lambda info: info.certificate.signature_algorithm_oid._name,
+        "valid_from": lambda info: info.certificate.not_valid_before_utc.strftime("%d/%m/%Y"),
+        "valid_to": lambda info: info.certificate.not_valid_after_utc.strftime("%d/%m/%Y"),
+        "public_key_size": lambda info: info.certificate.public_key().key_size,
+        "fingerprint_sha256": lambda info: info.certificate.fingerprint(hashes.SHA256()).hex(),
+        "ocsp_url": lambda info: _get_ocsp_url(info.certificate),
+        "subject_details": lambda info: _name_details(info.certificate.subject),
+        "issuer_details": lambda info: _name_details(info.certificate.issuer),
+        "public_key_algorithm": lambda info: info.certificate.public_bytes(
             encoding=serialization.Encoding.PEM
         ).decode('utf-8'),
-        "fingerprint_md5": cert.fingerprint(hashes.MD5()).hex(),
-        "fingerprint_sha1": cert.fingerprint(hashes.SHA1()).hex(),
-        "signature_value": cert.signature.hex(),
-        "extensions": extensions
+        "fingerprint_md5": lambda info: info.certificate.fingerprint(hashes.MD5()).hex(),
+        "fingerprint_sha1": lambda info: info.certificate.fingerprint(hashes.SHA1()).hex(),
+        "signature_value": lambda info: info.certificate.signature.hex(),
+        "extensions": lambda info: {ext.oid._name or "Unknown OID": str(ext.value) for ext in info.certificate.extensions},
     }
 
+    def __init__(self, certificate: x509.Certificate):
+        self.certificate = certificate
+        self._values = {}
+
+    def __getitem__(self, key: str):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        compute = self.FIELDS[key]
+        value = self._values[key] = compute(self)
+        return value
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __repr__(self):
+        return f"CertificateInfo({self.certificate.subject.rfc4514_string()!r})"
+
+    def to_dict(self) -> dict:
+        return {key: self[key] for key in self.FIELDS}
+
+
+def get_certificate_info(cert: x509.Certificate) -> CertificateInfo:
+    return CertificateInfo(cert)
+
 
 def _get_ocsp_url(cert: x509.Certificate) -> str:
     with contextlib.suppress(x509.ExtensionNotFound):
@@ -0,0 +1,144 @@
+"""
+Minimal reader for the PKCS#7 / CMS SignedData envelope of a .mobileprovision.
+
+Only walks the structure; nothing is verified. Everything returned is a
+memoryview slice of the input, except for content split over a constructed
+OCTET STRING, which has to be joined.
+"""
+from typing import Iterator, List, NamedTuple, Optional, Union
+
+SEQUENCE = 0x30
+SET = 0x31
+OID = 0x06
+OCTET_STRING = 0x04
+OCTET_STRING_CONSTRUCTED = 0x24
+CONTEXT_0 = 0xA0
+
+# 1.2.840.113549.1.7.2 and 1.2.840.113549.1.7.1
+SIGNED_DATA_OID = bytes.fromhex("2a864886f70d010702")
+DATA_OID = bytes.fromhex("2a864886f70d010701")
+
+
+class Element(NamedTuple):
+    tag: int
+    start: int  # first byte of the tag
+    content_start: int
+    content_end: int
+    end: int  # first byte after the element, end-of-contents octets included
+
+
+class SignedData(NamedTuple):
+    content_type: memoryview
+    content: Optional[Union[memoryview, bytes]]
+    certificates: List[memoryview]
+
+
+def _element(data: memoryview, offset: int, limit: int) -> Element:
+    if offset + 2 > limit:
+        raise ValueError(f"Truncated element at offset {offset}")
+
+    tag = data[offset]
+    position = offset + 1
+    if tag & 0x1F == 0x1F:
+        # high tag number form, not used by CMS but skipped correctly
+        while position < limit and data[position] & 0x80:
+            position += 1
+        position += 1
+
+    if position >= limit:
+        raise ValueError(f"Truncated element at offset {offset}")
+    length = data[position]
+    position += 1
+
+    if length == 0x80:
+        if not tag & 0x20:
+            raise ValueError(f"Indefinite length on primitive element at offset {offset}")
+        # indefinite length, the content runs until the end-of-contents octets
+        child = position
+        while True:
+            if child + 2 > limit:
+                raise ValueError(f"Missing end-of-contents for element at offset {offset}")
+            if data[child] == 0 and data[child + 1] == 0:
+                return Element(tag, offset, position, child, child + 2)
+            child = _element(data, child, limit).end
+
+    if length & 0x80:
+        count = length & 0x7F
+        if count > 4 or position + count > limit:
+            raise ValueError(f"Unsupported length at offset {offset}")
+        length = int.from_bytes(data[position:position + count], "big")
+        position += count
+
+    if position + length > limit:
+        raise ValueError(f"Element at offset {offset} runs past its parent")
+    return Element(tag, offset, position, position + length, position + length)
+
+
+def _children(data: memoryview, parent: Element) -> Iterator[Element]:
+    offset = parent.content_start
+    while offset < parent.content_end:
+        child = _element(data, offset, parent.content_end)
+        yield child
+        offset = child.end
+
+
+def _expect(element: Optional[Element], tag: int, what: str) -> Element:
+    if element is None or element.tag != tag:
+        raise ValueError(f"Expected {what}")
+    return element
+
+
+def _octet_string(data: memoryview, element: Element) -> Union[memoryview, bytes]:
+    if element.tag == OCTET_STRING:
+        return data[element.content_start:element.content_end]
+    if element.tag != OCTET_STRING_CONSTRUCTED:
+        raise ValueError("Expected OCTET STRING content")
+
+    chunks = [_octet_string(data, chunk) for chunk in _children(data, element)]
+    if len(chunks) == 1:
+        return chunks[0]
+    return b"".join(chunks)
+
+
+def parse_signed_data(blob: Union[bytes, bytearray, memoryview]) -> SignedData:
+    data = memoryview(blob)
+
+    content_info = _expect(_element(data, 0, len(data)), SEQUENCE, "ContentInfo")
+    fields = _children(data, content_info)
+    content_type = _expect(next(fields, None), OID, "ContentInfo contentType")
+    if data[content_type.content_start:content_type.content_end] != SIGNED_DATA_OID:
+        raise ValueError("Not a SignedData envelope")
+
+    explicit = _expect(next(fields, None), CONTEXT_0, "SignedData content")
+    signed_data = _expect(next(_children(data, explicit), None), SEQUENCE, "SignedData")
+
+    fields = _children(data, signed_data)
+    next(fields, None)  # version
+    _expect(next(fields, None), SET, "digestAlgorithms")
+
+    encap = _expect(next(fields, None), SEQUENCE, "EncapsulatedContentInfo")
+    encap_fields = _children(data, encap)
+    econtent_type = _expect(next(encap_fields, None), OID, "eContentType")
+    # a profile signs its plist as plain data, anything else isn't one
+    if data[econtent_type.content_start:econtent_type.content_end] != DATA_OID:
+        raise ValueError("Unexpected eContentType, expected data")
+    content = None
+    econtent = next(encap_fields, None)
+    if econtent is not None:
+        econtent = _expect(econtent, CONTEXT_0, "eContent")
+        octets = next(_children(data, econtent), None)
+        if octets is None:
+            raise ValueError("Empty eContent")
+        content = _octet_string(data, octets)
+
+    certificates = []
+    for field in fields:
+        if field.tag == CONTEXT_0:
+            certificates = [data[cert.start:cert.end] for cert in _children(data, field) if cert.tag == SEQUENCE]
+            break
+
+    return SignedData(
+        content_type=data[econtent_type.content_start:econtent_type.content_end],
+        content=content,
+        certificates=certificates,
+    )
@@ -0,0 +1,72 @@
+import time
+import logging
+import contextlib
+from typing import Dict, Optional
+from cryptography import x509
+from checker.ca_cache import CertificateCache
+
+
+WWDR_CERTIFICATES = {
+    "AppleWWDRCA": "https://developer.apple.com/certificationauthority/AppleWWDRCA.cer",
+    "AppleWWDRCAG2": "https://www.apple.com/certificateauthority/AppleWWDRCAG2.cer",
+    "AppleWWDRCAG3": "https://www.apple.com/certificateauthority/AppleWWDRCAG3.cer",
+    "AppleWWDRCAG4": "https://www.apple.com/certificateauthority/AppleWWDRCAG4.cer",
+    "AppleWWDRCAG5": "https://www.apple.com/certificateauthority/AppleWWDRCAG5.cer",
+    "AppleWWDRCAG6": "https://www.apple.com/certificateauthority/AppleWWDRCAG6.cer",
+}
+
+
+def subject_key_identifier(cert: x509.Certificate) -> bytes:
+    with contextlib.suppress(x509.ExtensionNotFound):
+        return cert.extensions.get_extension_for_class(x509.SubjectKeyIdentifier).value.digest
+    return x509.SubjectKeyIdentifier.from_public_key(cert.public_key()).digest
+
+
+def authority_key_identifier(cert: x509.Certificate) -> Optional[bytes]:
+    with contextlib.suppress(x509.ExtensionNotFound):
+        return cert.extensions.get_extension_for_class(x509.AuthorityKeyIdentifier).value.key_identifier
+    return None
+
+
+class IssuerStore:
+    """
+    WWDR intermediates indexed by subject key identifier.
+
+    The issuer of a developer certificate is picked by its authority key
+    identifier, so a check makes exactly one OCSP request. Certificates come
+    from CertificateCache, which keeps them on disk.
+    """
+    # how long to wait before trying to download missing intermediates again
+    retry_interval: int = 60 * 60
+
+    _by_ski: Dict[bytes, x509.Certificate] = {}
+    _version: int = -1
+    _loaded_at: float = 0
+
+    @classmethod
+    def _index(cls):
+        cls._by_ski = {subject_key_identifier(cert): cert for cert in CertificateCache.cached().values()}
+        cls._version = CertificateCache.version
+
+    @classmethod
+    async def load(cls):
+        await CertificateCache.warm(WWDR_CERTIFICATES.values())
+        cls._loaded_at = time.monotonic()
+        cls._index()
+        logging.info(f"Indexed {len(cls._by_ski)}/{len(WWDR_CERTIFICATES)} WWDR intermediates")
+
+    @classmethod
+    async def issuer_for(cls, cert: x509.Certificate) -> Optional[x509.Certificate]:
+        aki = authority_key_identifier(cert)
+        if aki is None:
+            return None
+
+        if cls._version != CertificateCache.version:
+            cls._index()
+
+        issuer = cls._by_ski.get(aki)
+        stale = time.monotonic() - cls._loaded_at > cls.retry_interval
+        if issuer is None and (not cls._loaded_at or (stale and len(cls._by_ski) < len(WWDR_CERTIFICATES))):
+            await cls.load()
+            issuer = cls._by_ski.get(aki)
+        return issuer
@@ -0,0 +1,112 @@
+import json
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+import redis.asyncio as redis
+
+
+class OCSPCache:
+    """
+    OCSP answers keyed by (issuer key hash, serial number).
+
+    An answer is fresh until the responder's ``next_update`` (or
+    ``default_ttl`` when it gives none). After that it is served for another
+    ``stale_ttl`` seconds while a single background request revalidates it.
+    Stored in Redis when configured, so every bot process shares it, and in
+    process memory otherwise.
+    """
+    prefix: str = "ocsp"
+    default_ttl: int = 60 * 60
+    stale_ttl: int = 6 * 60 * 60
+    stale_while_revalidate: bool = True
+
+    client: Optional[redis.Redis] = None
+
+    _local: Dict[str, Tuple[dict, float]] = {}
+    _refreshing: Set[str] = set()
+    _tasks: Set[asyncio.Task] = set()
+
+    @classmethod
+    def configure(cls, client: Optional[redis.Redis], default_ttl: Optional[int] = None, stale_ttl: Optional[int] = None, stale_while_revalidate: Optional[bool] = None):
+        cls.client = client
+        if default_ttl is not None:
+            cls.default_ttl = default_ttl
+        if stale_ttl is not None:
+            cls.stale_ttl = stale_ttl
+        if stale_while_revalidate is not None:
+            cls.stale_while_revalidate = stale_while_revalidate
+
+    @classmethod
+    def key(cls, issuer_key_hash: bytes, serial_number: int) -> str:
+        return f"{cls.prefix}:{issuer_key_hash.hex()}:{serial_number:x}"
+
+    @classmethod
+    async def _read(cls, key: str) -> Optional[dict]:
+        if cls.client is not None:
+            try:
+                cached = await cls.client.get(key)
+                return json.loads(cached) if cached is not None else None
+            except Exception:
+                logging.exception(f"Failed to read {key} from cache")
+                return None
+
+        entry = cls._local.get(key)
+        if entry is None:
+            return None
+        answer, expires_at = entry
+        if expires_at <= time.time():
+            cls._local.pop(key, None)
+            return None
+        return answer
+
+    @classmethod
+    async def _write(cls, key: str, answer: dict):
+        fresh_until = answer.get("next_update") or answer["checked_at"] + cls.default_ttl
+        answer["fresh_until"] = fresh_until
+        expires_in = max(int(fresh_until - time.time()), 0) + cls.stale_ttl
+        if cls.client is not None:
+            try:
+                await cls.client.set(key, json.dumps(answer), ex=max(expires_in, 1))
+            except Exception:
+                logging.exception(f"Failed to write {key} to cache")
+        else:
+            cls._local[key] = (answer, time.time() + expires_in)
+
+    @classmethod
+    async def fetch(cls, key: str, query: Callable[[], Awaitable[dict]]) -> dict:
+        cached = await cls._read(key)
+        if cached is not None:
+            if cached["fresh_until"] > time.time():
+                return cached
+            if cls.stale_while_revalidate:
+                cls._revalidate(key, query)
+                return cached
+
+        return await cls._query(key, query)
+
+    @classmethod
+    async def _query(cls, key: str, query: Callable[[], Awaitable[dict]]) -> dict:
+        answer = await query()
+        # only definite answers are worth keeping, failures are retried next time
+        if answer["status"] in ["ENABLED", "REVOKED"]:
+            await cls._write(key, answer)
+        return answer
+
+    @classmethod
+    def _revalidate(cls, key: str, query: Callable[[], Awaitable[dict]]):
+        if key in cls._refreshing:
+            return
+        cls._refreshing.add(key)
+
+        async def refresh():
+            try:
+                await cls._query(key, query)
+            except Exception:
+                logging.exception(f"Failed to revalidate {key}")
+            finally:
+                cls._refreshing.discard(key)
+
+        task = asyncio.create_task(refresh())
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
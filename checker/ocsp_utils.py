@@ -1,23 +1,41 @@
-import requests
+import time
+import aiohttp
+from datetime import datetime, timezone
 from cryptography import x509
 from cryptography.hazmat.primitives import serialization
 from cryptography.x509 import ocsp
+from checker.ocsp_cache import OCSPCache
 
 
-def _ocsp_check(p12_cert: x509.Certificate, ca_cert: x509.Certificate, ocsp_url: str) -> str:
-    builder = ocsp.OCSPRequestBuilder().add_certificate(
-        p12_cert, ca_cert, p12_cert.signature_hash_algorithm
-    )
-    req = builder.build()
+def _timestamp(value: datetime) -> float:
+    # ocsp update times are naive utc datetimes
+    return value.replace(tzinfo=timezone.utc).timestamp()
 
-    response = requests.post(
+
+async def _ocsp_query(session: aiohttp.ClientSession, req: ocsp.OCSPRequest, ocsp_url: str) -> dict:
+    async with session.post(
         ocsp_url, data=req.public_bytes(serialization.Encoding.DER),
         headers={'Content-Type': 'application/ocsp-request'}
-    )
-    ocsp_response = ocsp.load_der_ocsp_response(response.content)
+    ) as response:
+        content = await response.read()
+    ocsp_response = ocsp.load_der_ocsp_response(content)
 
+    answer = {"status": "OCSP check failed", "this_update": None, "next_update": None, "checked_at": time.time()}
     if ocsp_response.response_status == ocsp.OCSPResponseStatus.SUCCESSFUL:
         status = ocsp_response.certificate_status
-        return "ENABLED" if status == ocsp.OCSPCertStatus.GOOD else "REVOKED" if status == ocsp.OCSPCertStatus.REVOKED else "Unknown"
-    else:
-        return "OCSP check failed"
+        answer["status"] = "ENABLED" if status == ocsp.OCSPCertStatus.GOOD else "REVOKED" if status == ocsp.OCSPCertStatus.REVOKED else "Unknown"
+        answer["this_update"] = _timestamp(ocsp_response.this_update)
+        if ocsp_response.next_update is not None:
+            answer["next_update"] = _timestamp(ocsp_response.next_update)
+    return answer
+
+
+async def _ocsp_check(session: aiohttp.ClientSession, p12_cert: x509.Certificate, ca_cert: x509.Certificate, ocsp_url: str) -> str:
+    builder = ocsp.OCSPRequestBuilder().add_certificate(
+        p12_cert, ca_cert, p12_cert.signature_hash_algorithm
+    )
+    req = builder.build()
+
+    key = OCSPCache.key(req.issuer_key_hash, req.serial_number)
+    answer = await OCSPCache.fetch(key, lambda: _ocsp_query(session, req, ocsp_url))
+    return answer["status"]
@@ -0,0 +1,81 @@
+import base64
+import hashlib
+from datetime import datetime
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Union
+from cryptography import x509
+from cryptography.hazmat.primitives import serialization
+from checker.entitlement_utils import check_entitlements
+from checker.certificate_utils import CertificateInfo, parse_mobileprovision, extract_cert_from_plist, get_certificate_info
+
+
+class ParsedProfile(NamedTuple):
+    certificate: x509.Certificate
+    certificate_info: CertificateInfo
+    entitlements: dict
+    expiration_date: Optional[datetime]
+    size: int
+
+
+def parse_profile(mobileprovision: bytes) -> ParsedProfile:
+    plist = parse_mobileprovision(mobileprovision)
+    cert, entitlements = extract_cert_from_plist(plist)
+    entitlements_info = check_entitlements(entitlements)
+    # rough footprint (certificate plus whatever info gets computed from it), good enough to keep the cache bounded
+    size = 4 * len(cert.public_bytes(serialization.Encoding.DER)) + len(repr(entitlements_info))
+    return ParsedProfile(cert, get_certificate_info(cert), entitlements_info, plist.get("ExpirationDate"), size)
+
+
+class ProfileCache:
+    """
+    Parsed provisioning profiles keyed by the sha256 of their base64 content.
+
+    A stored profile never changes, so checking the same device again skips
+    decoding and parsing it. Least recently used profiles are evicted once
+    the entries add up to more than ``max_bytes``.
+    """
+    max_bytes: int = 16 * 1024 * 1024
+
+    hits: int = 0
+    misses: int = 0
+
+    _entries: "OrderedDict[str, ParsedProfile]" = OrderedDict()
+    _size: int = 0
+
+    @classmethod
+    def configure(cls, max_bytes: int):
+        cls.max_bytes = max_bytes
+        cls._evict()
+
+    @staticmethod
+    def key(profile_content: Union[str, bytes]) -> str:
+        if isinstance(profile_content, str):
+            profile_content = profile_content.encode()
+        return hashlib.sha256(profile_content).hexdigest()
+
+    @classmethod
+    def get(cls, profile_content: Union[str, bytes]) -> ParsedProfile:
+        key = cls.key(profile_content)
+        profile = cls._entries.get(key)
+        if profile is not None:
+            cls._entries.move_to_end(key)
+            cls.hits += 1
+            return profile
+
+        cls.misses += 1
+        profile = parse_profile(base64.b64decode(profile_content))
+        cls._entries[key] = profile
+        cls._size += profile.size
+        cls._evict()
+        return profile
+
+    @classmethod
+    def _evict(cls):
+        while cls._size > cls.max_bytes and cls._entries:
+            _, profile = cls._entries.popitem(last=False)
+            cls._size -= profile.size
+
+    @classmethod
+    def clear(cls):
+        cls._entries.clear()
+        cls._size = 0
@@ -1,3 +1,4 @@
+import os
 from r2 import R2Storage
 
 BOT_TOKEN = "main_bot_token"
@@ -25,6 +26,62 @@ WEBAPP_URL = "https://udid.p12.ru"
 
 CHECK_DURATION = 2
 
+# shared connection pool used for App Store Connect requests
+HTTP_POOL_LIMIT = 100
+HTTP_POOL_LIMIT_PER_HOST = 30
+HTTP_DNS_CACHE_TTL = 5 * 60
+HTTP_KEEPALIVE_TIMEOUT = 60
+HTTP_TIMEOUT = 60
+
+# pre-generated rsa key pairs used when creating certificates
+KEY_POOL_SIZE = 8
+KEY_POOL_LOW_WATER = 2
+KEY_POOL_WORKERS = 2
+
+# app store connect api, point it at a local stand-in (python -m api.fake) for tests and
+# benchmarks with the ASC_API_ENDPOINT environment variable
+ASC_API_ENDPOINT = os.environ.get("ASC_API_ENDPOINT", "https://api.appstoreconnect.apple.com/v1")
+
+# cache read-only app store connect lookups in redis (seconds per endpoint)
+ASC_CACHE_ENABLED = False
+ASC_CACHE_TTLS = {
+    "users": 10 * 60,
+    "certificates": 5 * 60,
+    "certificate": 5 * 60,
+    "device": 60,
+}
+
+# accounts checked at once by the hourly checker, and how long one account may take (seconds)
+CHECKER_CONCURRENCY = 20
+CHECKER_ACCOUNT_TIMEOUT = 5 * 60
+
+# pending udids are polled every CHECKER_EARLY_INTERVAL until CHECKER_DUE_WINDOW before apple
+# usually enables them (3.5 days after being added), every CHECKER_DUE_INTERVAL within that
+# window and every CHECKER_LATE_INTERVAL after it (seconds)
+CHECKER_TICK_INTERVAL = 5 * 60
+CHECKER_EARLY_INTERVAL = 12 * 60 * 60
+CHECKER_DUE_WINDOW = 12 * 60 * 60
+CHECKER_DUE_INTERVAL = 15 * 60
+CHECKER_LATE_INTERVAL = 60 * 60
+CHECKER_INELIGIBLE_INTERVAL = 6 * 60 * 60
+
+# run the account checker inside the bot; turn off when it runs as separate
+# `python -m api.worker` processes. The bot and any number of workers share the
+# accounts through redis leases that expire CHECKER_LEASE_TTL seconds after
+# their holder dies; a swept account is left alone for CHECKER_SWEEP_COOLDOWN.
+CHECKER_IN_BOT = True
+CHECKER_LEASE_TTL = 60
+CHECKER_SWEEP_COOLDOWN = 50 * 60
+
+# max operations per bulk_write sent by the checker
+CHECKER_BULK_BATCH_SIZE = 500
+
+# how long the certificate status recorded by the hourly checker is trusted by /chk (seconds)
+CERTIFICATE_STATUS_MAX_AGE = 2 * 60 * 60
+
+# parsed provisioning profiles kept in memory by the checker
+PROFILE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
 R2 = R2Storage(
     endpoint_url="https://dasfasdjfhjasdjkfsd???",
     key_id="keyid",
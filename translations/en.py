@@ -75,6 +75,7 @@ Entitlements:
 
     GET_CERTIFICATE_BUTTON = "⬇️ Get Certificate ({first_name} {last_name})"
     UDID_NOT_FOUND_ERROR = "UDID not found!"
+    PROFILE_READ_ERROR = "<code>{udid}</code>: could not read the profile of this device."
     UDID_ALREADY_REGISTERED = "<code>{udid}</code> Wrong UDiD!"
 
     ERROR_REGISTERING_UDID = "Error registering UDID! \nReason:\nEnter developer account and accept Apple terms and agreements'\n\n``Developer.apple.com``"
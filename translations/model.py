@@ -56,6 +56,7 @@ class LanguagePack:
     GET_CERTIFICATE_BUTTON: str
     
     UDID_NOT_FOUND_ERROR: str 
+    PROFILE_READ_ERROR: str
     UDID_ALREADY_REGISTERED: str
 
     ERROR_REGISTERING_UDID: str
@@ -76,6 +76,7 @@ UDID : <code>{udid}</code>
 
     GET_CERTIFICATE_BUTTON = "⬇️ Получить сертификат ({first_name} {last_name})"
     UDID_NOT_FOUND_ERROR = "UDID не найден!"
+    PROFILE_READ_ERROR = "<code>{udid}</code>: не удалось прочитать профиль этого устройства."
     UDID_ALREADY_REGISTERED = "<code>{udid}</code> Неверный UDID!"
 
     ERROR_REGISTERING_UDID = "Ошибка при регистрации UDID! \nПричина:\nВойдите в аккаунт разработчика и примите условия и соглашения Apple'\n\n``Developer.apple.com``"